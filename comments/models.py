@@ -6,10 +6,13 @@ from mptt.models import MPTTModel, TreeForeignKey
 from django.db import models
 from django import forms
 from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.utils.encoding import force_str
 from django.utils.translation import gettext_lazy as _
-from notifications.signals import notify
 
-from press.utils import user_regex
+from press.services.mentions import mentioned_users
+from press.services.notifications import notify_many
+from press.services.pagecache import invalidate_comment_tree, invalidate_post_pages
 
 
 class MPTTComment(MPTTModel, Comment):
@@ -22,9 +25,19 @@ class MPTTComment(MPTTModel, Comment):
     old = models.BooleanField(default=False)
 
     def save(self, *args, **kwargs):
+        from press.models import Mention
+
+        adding = self._state.adding
         super().save(*args, **kwargs)
-        if hasattr(self.content_object, "recount_comments"):
-            self.content_object.recount_comments()
+        self._new_mentions = Mention.objects.sync(
+            mentioned_users(self.comment), comment=self
+        )
+        invalidate_comment_tree(self.object_pk)
+        if hasattr(self.content_object, "bump_counter"):
+            if adding:
+                self.content_object.bump_counter("comment_count", 1)
+            else:
+                invalidate_post_pages(self.object_pk)
             self.notify_mentions()
 
     def _clean_fields(self, *args, **kwargs):
@@ -33,17 +46,14 @@ class MPTTComment(MPTTModel, Comment):
             self.cleaned_data[name] = bleach.clean(value)
 
     def get_mentions(self):
-        usernames = [username for username in user_regex().findall(self.comment)]
-        return User.objects.filter(username__in=usernames)
+        return User.objects.filter(mentions__comment=self)
 
     def notify_mentions(self):
-        for user in self.get_mentions():
-            notify.send(
-                self.user,
-                recipient=user,
-                verb="mentioned you in his comment",
-                action_object=self,
-            )
+        """Notify the users mentioned for the first time by the last save."""
+        new_mentions, self._new_mentions = getattr(self, "_new_mentions", []), []
+        notify_many(
+            self.user, new_mentions, "mentioned you in his comment", action_object=self
+        )
 
     def get_absolute_url(self, anchor_pattern="#c%(id)s"):
         content_url = self.content_object.get_absolute_url()
@@ -58,15 +68,28 @@ class MPTTComment(MPTTModel, Comment):
 
 
 class MPTTCommentForm(CommentForm):
-    parent = forms.ModelChoiceField(
-        queryset=MPTTComment.objects.all(), required=False, widget=forms.HiddenInput
-    )
+    # A plain id; the page's single reply form sets it to the node it's
+    # attached to, and clean_parent resolves it.
+    parent = forms.IntegerField(required=False, widget=forms.HiddenInput)
     comment = forms.CharField(
         label=_("Comment"),
         widget=forms.Textarea(attrs={"placeholder": "Thoughts?"}),
         max_length=COMMENT_MAX_LENGTH,
     )
 
+    def clean_parent(self):
+        parent_id = self.cleaned_data.get("parent")
+        if parent_id is None:
+            return None
+        parent = MPTTComment.objects.filter(
+            pk=parent_id,
+            content_type=ContentType.objects.get_for_model(self.target_object),
+            object_pk=force_str(self.target_object._get_pk_val()),
+        ).first()
+        if parent is None:
+            raise forms.ValidationError(_("The comment you replied to doesn't exist."))
+        return parent
+
     def get_comment_model(self):
         # Use our custom comment model instead of the built-in one.
         return MPTTComment
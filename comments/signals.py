@@ -0,0 +1,12 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from comments.models import MPTTComment
+from press.services.pagecache import invalidate_comment_tree
+
+
+@receiver(post_delete, sender=MPTTComment)
+def comment_deleted(sender, instance: MPTTComment, *args, **kwargs):
+    invalidate_comment_tree(instance.object_pk)
+    if hasattr(instance.content_object, "bump_counter"):
+        instance.content_object.bump_counter("comment_count", -1)
@@ -0,0 +1,8 @@
+from django.urls import path
+
+from comments.views import CommentRepliesView, CommentRootsView
+
+urlpatterns = [
+    path("thread/<int:pk>/", CommentRootsView.as_view(), name="comment-roots"),
+    path("<int:pk>/replies/", CommentRepliesView.as_view(), name="comment-replies"),
+]
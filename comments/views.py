@@ -1,3 +1,25 @@
-from django.shortcuts import render
+from django.http import Http404
+from django.shortcuts import get_object_or_404, render
+from django.views import View
 
-# Create your views here.
+from press.models import Post
+from press.services.threads import root_cursor, visible_comments
+
+
+class CommentRootsView(View):
+    """A page of a post's top-level comments, for "load more comments"."""
+
+    def get(self, request, pk):
+        post = get_object_or_404(Post, pk=pk)
+        after = root_cursor(post, request.GET.get("after"))
+        if after is None:
+            raise Http404
+        return render(request, "_comment_page.html", {"object": post, "after": after})
+
+
+class CommentRepliesView(View):
+    """The whole subtree under one comment, for "load replies"."""
+
+    def get(self, request, pk):
+        root = get_object_or_404(visible_comments(), pk=pk)
+        return render(request, "_comment_replies.html", {"root": root})
@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from press.services.notifications import drain_queue, queue_stats
+
+
+class Command(BaseCommand):
+    help = "Deliver queued notifications in batches. Runs until interrupted unless --once is given."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--threads", type=int, default=4)
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=1.0,
+            help="Seconds to wait when the queue is empty.",
+        )
+        parser.add_argument(
+            "--once", action="store_true", help="Drain the queue and exit."
+        )
+        parser.add_argument(
+            "--stats", action="store_true", help="Print queue depth and lag and exit."
+        )
+
+    def handle(self, *args, **options):
+        if options["stats"]:
+            stats = queue_stats()
+            self.stdout.write(f"depth={stats['depth']} lag={stats['lag']:.1f}s")
+            return
+
+        while True:
+            lag = queue_stats()["lag"]
+            delivered = drain_queue(options["batch_size"], options["threads"])
+            if delivered:
+                self.stdout.write(
+                    f"Delivered {delivered} notifications, lag {lag:.1f}s"
+                )
+                continue
+            if options["once"]:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from press.services.counters import RECONCILE_BATCH_SIZE, reconcile_counters
+
+
+class Command(BaseCommand):
+    help = "Recompute the like, follow and comment counters of every post and fix the ones that drifted."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=RECONCILE_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        drift = reconcile_counters(batch_size=options["batch_size"])
+        for name, found in drift.items():
+            self.stdout.write(
+                f"{name}: fixed {found['posts']} posts, off by {found['off_by']} in total"
+            )
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from press.services.notifications import RECONCILE_BATCH_SIZE, reconcile_unread_counts
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount the cached unread notification counts and fix the ones that drifted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=RECONCILE_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        drift = reconcile_unread_counts(batch_size=options["batch_size"])
+        self.stdout.write(
+            f"unread: fixed {drift['users']} users, off by {drift['off_by']} in total"
+        )
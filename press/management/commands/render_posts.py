@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from press.models import Post
+from press.services.render import render_content, render_key
+
+
+class Command(BaseCommand):
+    help = "Re-render the stored HTML of posts whose content or renderer configuration changed."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force", action="store_true", help="Re-render every post."
+        )
+        parser.add_argument("--batch-size", type=int, default=100)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        posts = Post.objects.only("id", "content", "content_html_key")
+        stale, rendered = [], 0
+        for post in posts.iterator(chunk_size=batch_size):
+            key = render_key(post.content)
+            if not options["force"] and post.content_html_key == key:
+                continue
+            post.content_html = render_content(post.content)
+            post.content_html_key = key
+            stale.append(post)
+            if len(stale) >= batch_size:
+                rendered += Post.objects.bulk_update(
+                    stale, ["content_html", "content_html_key"]
+                )
+                stale = []
+        if stale:
+            rendered += Post.objects.bulk_update(
+                stale, ["content_html", "content_html_key"]
+            )
+        self.stdout.write(f"Rendered {rendered} posts")
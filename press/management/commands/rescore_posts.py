@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from press.services.rank import RESCORE_BATCH_SIZE, rescore_posts, trending_cache_stats
+
+
+class Command(BaseCommand):
+    help = "Re-decay the stored trending score of every post. Runs once, or every --interval seconds."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=RESCORE_BATCH_SIZE)
+        parser.add_argument(
+            "--interval",
+            type=float,
+            help="Keep running, rescoring every INTERVAL seconds.",
+        )
+        parser.add_argument(
+            "--stats",
+            action="store_true",
+            help="Print the trending head cache's hits and misses and exit.",
+        )
+
+    def handle(self, *args, **options):
+        if options["stats"]:
+            stats = trending_cache_stats()
+            total = stats["hits"] + stats["misses"]
+            ratio = stats["hits"] / total if total else 0.0
+            self.stdout.write(
+                f"hits={stats['hits']} misses={stats['misses']} hit_ratio={ratio:.2f}"
+            )
+            return
+        while True:
+            updated = rescore_posts(batch_size=options["batch_size"])
+            self.stdout.write(f"Rescored {updated} posts")
+            if options["interval"] is None:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,144 @@
+from time import perf_counter
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils import timezone
+
+from press.models import Post
+from press.services.rank import (
+    G,
+    get_live_trending_posts_queryset,
+    get_trending_posts_queryset,
+    set_score_epoch,
+)
+
+PAGE = 15
+
+
+class Command(BaseCommand):
+    help = (
+        "Rank every post in memory for one or more gravities, compare the "
+        "orderings and optionally write the scores back. With --benchmark, "
+        "time SQL against in-memory ranking on synthetic tables, in a "
+        "throwaway test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--gravity",
+            type=float,
+            action="append",
+            help=f"Gravity to rank with; repeat to compare several (default {G}).",
+        )
+        parser.add_argument(
+            "--write",
+            action="store_true",
+            help=f"Store the scores computed with the configured gravity ({G}).",
+        )
+        parser.add_argument(
+            "--benchmark",
+            type=int,
+            nargs="*",
+            metavar="POSTS",
+            help="Synthetic table sizes to benchmark (default 10000), e.g. 10000 100000.",
+        )
+        parser.add_argument(
+            "--database",
+            default=DEFAULT_DB_ALIAS,
+            help="Server to create the benchmark's throwaway test database on.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            from press.services import rerank
+        except ImportError:
+            raise CommandError("tune_gravity needs numpy: pip install numpy")
+
+        if options["benchmark"] is not None:
+            # Synthetic rows never go near real data: the benchmark builds
+            # and drops its own test database, like the test runner does.
+            connection = connections[options["database"]]
+            old_name = connection.settings_dict["NAME"]
+            connection.creation.create_test_db(verbosity=0, serialize=False)
+            try:
+                for size in options["benchmark"] or [10_000]:
+                    self.benchmark(rerank, size)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                # SQLite ignores close() on an in-memory database; with the
+                # real name restored this one drops the test database.
+                connection.close()
+            return
+
+        gravities = options["gravity"] or [G]
+        now = timezone.now()
+        inputs = rerank.load_inputs(now)
+        if not len(inputs.ids):
+            self.stdout.write("No posts to rank")
+            return
+
+        baseline = rerank.scores(inputs, G)
+        baseline_order = rerank.order(inputs, baseline)
+        sql_order = list(
+            get_live_trending_posts_queryset(now=now).values_list("id", flat=True)
+        )
+        self.stdout.write(
+            f"{len(inputs.ids)} posts, G={G} in memory vs SQL: "
+            f"rho={rerank.rank_correlation(inputs.ids, baseline_order, sql_order):.4f}"
+        )
+        for gravity in gravities:
+            ordered = rerank.order(inputs, rerank.scores(inputs, gravity))
+            rho = rerank.rank_correlation(inputs.ids, baseline_order, ordered)
+            self.stdout.write(
+                f"G={gravity}: rho vs G={G} {rho:.4f}, "
+                f"top {PAGE}: {' '.join(str(pk) for pk in ordered[:PAGE])}"
+            )
+
+        if options["write"]:
+            set_score_epoch(now)
+            written = rerank.write_scores(inputs, baseline)
+            self.stdout.write(f"Wrote {written} scores")
+
+    def benchmark(self, rerank, size):
+        """Time each ranking path on ``size`` synthetic posts, then roll back."""
+        with transaction.atomic():
+            now = timezone.now()
+            users = User.objects.bulk_create(
+                [User(username=f"bench-{i}") for i in range(size)], batch_size=5000
+            )
+            posts = []
+            for i, user in enumerate(users):
+                modified = (now - timezone.timedelta(days=i % 365)).date()
+                post = Post(
+                    user=user,
+                    title=f"bench {i}",
+                    like_count=(i * 7919) % 500,
+                    modified_at=modified,
+                    created_at=modified,
+                )
+                post.refresh_score(now)
+                posts.append(post)
+            Post.objects.bulk_create(posts, batch_size=5000)
+
+            start = perf_counter()
+            list(get_live_trending_posts_queryset(now=now)[:PAGE])
+            sql = perf_counter() - start
+
+            start = perf_counter()
+            list(get_trending_posts_queryset()[:PAGE])
+            indexed = perf_counter() - start
+
+            start = perf_counter()
+            inputs = rerank.load_inputs(now)
+            loaded = perf_counter() - start
+            start = perf_counter()
+            rerank.top(inputs, rerank.scores(inputs), PAGE)
+            ranked = perf_counter() - start
+
+            self.stdout.write(
+                f"{size} posts: SQL ranking {sql * 1000:.1f}ms, "
+                f"stored index {indexed * 1000:.1f}ms, "
+                f"in-memory {ranked * 1000:.1f}ms (+{loaded * 1000:.1f}ms load)"
+            )
+            transaction.set_rollback(True)
@@ -0,0 +1,50 @@
+# Generated by Django 4.1.4 on 2026-10-18 11:01
+
+from datetime import datetime, time
+
+from django.db import migrations, models
+from django.utils import timezone
+
+# Frozen copy of the ranking at the time of this migration.
+GRAVITY = 1.8
+
+
+def trending_score(like_count, modified_at, now):
+    if modified_at is None:
+        return 0.0
+    updated = datetime.combine(modified_at, time.min, tzinfo=timezone.utc)
+    duration = max((now - updated).total_seconds(), 0.0)
+    return (like_count - 1.0) / (duration + 1.0) ** GRAVITY
+
+
+def backfill_scores(apps, schema_editor):
+    Post = apps.get_model("press", "Post")
+    now = timezone.now()
+    posts = list(Post.objects.only("id", "like_count", "modified_at", "created_at"))
+    for post in posts:
+        post.score = trending_score(
+            post.like_count, post.modified_at or post.created_at, now
+        )
+    Post.objects.bulk_update(posts, ["score"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("press", "0008_post_modified_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="post",
+            name="score",
+            field=models.FloatField(default=0.0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                fields=["-score", "-id"], name="press_post_trending_idx"
+            ),
+        ),
+        migrations.RunPython(backfill_scores, migrations.RunPython.noop),
+    ]
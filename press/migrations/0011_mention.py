@@ -0,0 +1,96 @@
+# Generated by Django 4.1.4 on 2026-10-18 11:08
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_mentions(apps, schema_editor):
+    from press.utils import user_regex
+
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split("."))
+    Post = apps.get_model("press", "Post")
+    MPTTComment = apps.get_model("comments", "MPTTComment")
+    Mention = apps.get_model("press", "Mention")
+
+    def mentions(text, **target):
+        usernames = set(user_regex().findall(text))
+        if not usernames:
+            return []
+        users = User.objects.filter(username__in=usernames).values_list("pk", flat=True)
+        return [Mention(user_id=pk, **target) for pk in users]
+
+    rows = []
+    for post in Post.objects.only("id", "content").iterator():
+        rows += mentions(post.content, post_id=post.pk)
+    for comment in MPTTComment.objects.only("id", "comment").iterator():
+        rows += mentions(comment.comment, comment_id=comment.pk)
+    Mention.objects.bulk_create(rows, batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("comments", "0003_alter_mpttcomment_options"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("press", "0010_post_content_html"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Mention",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "comment",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="mentions",
+                        to="comments.mpttcomment",
+                    ),
+                ),
+                (
+                    "post",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="mentions",
+                        to="press.post",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="mentions",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="mention",
+            constraint=models.UniqueConstraint(
+                fields=("user", "post"), name="press_mention_unique_post"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="mention",
+            constraint=models.UniqueConstraint(
+                fields=("user", "comment"), name="press_mention_unique_comment"
+            ),
+        ),
+        migrations.RunPython(backfill_mentions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("press", "0012_notificationevent"),
+        ("notifications", "0008_index_together_recipient_unread"),
+    ]
+
+    operations = [
+        # notifications_notification belongs to django-notifications, so the
+        # index backing the inbox's keyset pagination is created by hand.
+        migrations.RunSQL(
+            "CREATE INDEX press_notif_inbox_idx ON notifications_notification "
+            "(recipient_id, timestamp DESC, id DESC)",
+            "DROP INDEX press_notif_inbox_idx",
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.1.4 on 2026-10-18 11:17
+
+from django.db import migrations, models
+
+DELETE_BATCH_SIZE = 500
+
+
+def drop_duplicates(apps, schema_editor):
+    """Keep one row per (post, user), preferring the active one."""
+    for name in ("PostLike", "Follow"):
+        model = apps.get_model("press", name)
+        seen, duplicates = set(), []
+        rows = model.objects.order_by("post", "user", "-active", "id").values_list(
+            "id", "post", "user"
+        )
+        for pk, post_id, user_id in rows.iterator():
+            if (post_id, user_id) in seen:
+                duplicates.append(pk)
+            else:
+                seen.add((post_id, user_id))
+        for start in range(0, len(duplicates), DELETE_BATCH_SIZE):
+            model.objects.filter(
+                pk__in=duplicates[start : start + DELETE_BATCH_SIZE]
+            ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("press", "0013_notification_inbox_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="follow",
+            constraint=models.UniqueConstraint(
+                fields=("post", "user"), name="press_follow_unique"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="postlike",
+            constraint=models.UniqueConstraint(
+                fields=("post", "user"), name="press_postlike_unique"
+            ),
+        ),
+    ]
@@ -1,17 +1,20 @@
 import bleach
 
 from django.db import models
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
 from django.urls import reverse
 from django.contrib.auth.models import User
 from django.contrib.contenttypes.models import ContentType
 
 from django_resized import ResizedImageField
 from markdownx.models import MarkdownxField
-from markdownx.utils import markdownify
 
 from comments.models import MPTTComment
-from press.utils import user_regex
-from notifications.signals import notify
+from press.services.mentions import mentioned_users
+from press.services.notifications import build_notification, send_notifications
+from press.services.pagecache import invalidate_comment_tree, invalidate_post_pages
+from press.services.render import render_content, render_key
 
 
 User._meta.get_field("email")._unique = True
@@ -50,52 +53,177 @@ class Post(models.Model):
     like_count = models.PositiveIntegerField(default=0)
     follow_count = models.PositiveIntegerField(default=0)
     comment_count = models.PositiveIntegerField(default=0)
+    score = models.FloatField(default=0.0, editable=False)
+    content_html = models.TextField(blank=True, default="", editable=False)
+    content_html_key = models.CharField(
+        max_length=64, blank=True, default="", editable=False
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-score", "-id"], name="press_post_trending_idx"),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._snapshot()
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using=using, fields=fields)
+        self._snapshot(fields)
+
+    def _snapshot(self, fields=None):
+        loaded = {
+            field.attname: getattr(self, field.attname)
+            for field in self._meta.concrete_fields
+            if field.attname in self.__dict__
+            and (fields is None or field.name in fields or field.attname in fields)
+        }
+        if fields is None:
+            self._loaded = loaded
+        else:
+            self.__dict__.setdefault("_loaded", {}).update(loaded)
+
+    def get_dirty_fields(self):
+        """Names of the fields that changed since the post was loaded or saved."""
+        loaded = getattr(self, "_loaded", {})
+        return {
+            field.name
+            for field in self._meta.concrete_fields
+            if field.attname in self.__dict__
+            and (
+                field.attname not in loaded
+                or getattr(self, field.attname) != loaded[field.attname]
+            )
+        }
 
     def get_absolute_url(self):
         return reverse("post-detail", kwargs={"pk": self.pk})
 
     @property
     def markdown(self):
-        return markdownify(bleach.clean(self.content))
+        """
+        The rendered post. Stored alongside the content and only rendered
+        again when the content or the renderer configuration changed.
+        """
+        if self.content_html_key != render_key(self.content):
+            self.render()
+            Post.objects.filter(pk=self.pk).update(
+                content_html=self.content_html, content_html_key=self.content_html_key
+            )
+            self._snapshot(["content_html", "content_html_key"])
+        return self.content_html
+
+    def render(self, users=None):
+        self.content_html = render_content(self.content, users)
+        self.content_html_key = render_key(self.content)
+
+    def bump_counter(self, field: str, delta: int):
+        """
+        Atomically add ``delta`` to one of the denormalized counters. Likes
+        also move the trending score, which is refreshed in the same UPDATE.
+        """
+        from press.services.rank import (
+            invalidate_trending_head,
+            score_epoch,
+            trending_score_expression,
+        )
+
+        if not delta:
+            return
+        value = Greatest(F(field) + delta, Value(0))
+        updates = {field: value}
+        if field == "like_count":
+            updates["score"] = trending_score_expression(likes=value, now=score_epoch())
+        Post.objects.filter(pk=self.pk).update(**updates)
+        invalidate_post_pages(self.pk)
+
+        setattr(self, field, max(getattr(self, field) + delta, 0))
+        if field == "like_count":
+            self.refresh_score()
+            invalidate_trending_head(self)
+        # The database already holds these values, a later save must not
+        # write the in-memory copies back over concurrent increments.
+        self.__dict__.setdefault("_loaded", {}).update(
+            {field: getattr(self, field), "score": self.score}
+        )
 
     def recount_likes(self):
         self.like_count = self.likes.filter(active=True).count()
-        self.save()
+        self.save(update_fields=["like_count", "score"])
 
     def recount_follows(self):
         self.follow_count = self.follows.filter(active=True).count()
-        self.save()
+        self.save(update_fields=["follow_count"])
 
     def recount_comments(self):
         self.comment_count = MPTTComment.objects.filter(
             content_type=ContentType.objects.get_for_model(self), object_pk=self.id,
         ).count()
-        self.save()
+        self.save(update_fields=["comment_count"])
 
     def make_comments_old(self):
         MPTTComment.objects.filter(
             content_type=ContentType.objects.get_for_model(self), object_pk=self.id,
         ).update(old=True)
+        invalidate_comment_tree(self.pk)
+        invalidate_post_pages(self.pk)
+
+    def refresh_score(self, now=None):
+        from press.services.rank import score_epoch, trending_score
+
+        self.score = trending_score(
+            self.like_count, self.modified_at or self.created_at, now or score_epoch()
+        )
 
     def save(self, *args, **kwargs):
-        self.content = bleach.clean(self.content)
-        lines = self.content.strip().splitlines()
-        if lines:
-            self.title = lines[0]
-        return super().save(*args, **kwargs)
+        """
+        Only sanitizes the content and re-derives the title when the content
+        changed, and narrows updates to the columns that actually changed.
+        """
+        adding = self._state.adding
+        dirty = self.get_dirty_fields()
+        mentioned = None
+        if adding or "content" in dirty:
+            self.content = bleach.clean(self.content)
+            lines = self.content.strip().splitlines()
+            if lines:
+                self.title = lines[0]
+            mentioned = mentioned_users(self.content)
+            self.render(mentioned)
+        if adding or dirty & {"like_count", "modified_at", "created_at"}:
+            self.refresh_score()
+
+        if not adding and not args and kwargs.get("update_fields") is None:
+            dirty = self.get_dirty_fields()
+            if not dirty:
+                return
+            kwargs["update_fields"] = dirty | {"updated_at"}
+        ret = super().save(*args, **kwargs)
+        self._snapshot()
+        if mentioned is not None:
+            self._new_mentions = Mention.objects.sync(mentioned, post=self)
+        return ret
 
     def get_mentions(self):
-        usernames = [username for username in user_regex().findall(self.content)]
-        return User.objects.filter(username__in=usernames)
+        return User.objects.filter(mentions__post=self)
 
     def notify_mentions(self):
-        for user in self.get_mentions():
-            notify.send(
-                self.user,
-                recipient=user,
-                verb="mentioned you in his post",
-                action_object=user.post,
-            )
+        """Notify the users mentioned for the first time by the last save."""
+        new_mentions, self._new_mentions = getattr(self, "_new_mentions", []), []
+        send_notifications(
+            [
+                build_notification(
+                    self.user,
+                    user,
+                    "mentioned you in his post",
+                    action_object=getattr(user, "post", None),
+                )
+                for user in new_mentions
+            ]
+        )
 
 
 class PostLike(models.Model):
@@ -105,10 +233,12 @@ class PostLike(models.Model):
     created_at = models.DateField(auto_now_add=True)
     updated_at = models.DateField(auto_now=True)
 
-    def save(self, *args, **kwargs):
-        ret = super().save(*args, **kwargs)
-        self.post.recount_likes()
-        return ret
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["post", "user"], name="press_postlike_unique"
+            ),
+        ]
 
 
 class Follow(models.Model):
@@ -118,7 +248,89 @@ class Follow(models.Model):
     created_at = models.DateField(auto_now_add=True)
     updated_at = models.DateField(auto_now=True)
 
-    def save(self, *args, **kwargs):
-        ret = super().save(*args, **kwargs)
-        self.post.recount_follows()
-        return ret
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["post", "user"], name="press_follow_unique"
+            ),
+        ]
+
+
+class MentionManager(models.Manager):
+    def sync(self, users, **target):
+        """
+        Make the mentions of ``target`` (``post=`` or ``comment=``) match
+        ``users`` and return the users that were not mentioned before.
+        """
+        users = {user.pk: user for user in users}
+        current = set(self.filter(**target).values_list("user_id", flat=True))
+        if current - users.keys():
+            self.filter(**target, user_id__in=current - users.keys()).delete()
+        added = [user for pk, user in users.items() if pk not in current]
+        self.bulk_create(
+            [self.model(user=user, **target) for user in added], ignore_conflicts=True
+        )
+        return added
+
+
+class Mention(models.Model):
+    """A user @mentioned in a post or a comment, kept in sync as the text is saved."""
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="mentions")
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE, null=True, blank=True, related_name="mentions"
+    )
+    comment = models.ForeignKey(
+        MPTTComment,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="mentions",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = MentionManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "post"], name="press_mention_unique_post"
+            ),
+            models.UniqueConstraint(
+                fields=["user", "comment"], name="press_mention_unique_comment"
+            ),
+        ]
+
+
+class NotificationEvent(models.Model):
+    """
+    A notification waiting in the local delivery queue. Request handlers only
+    insert these; the process_notifications worker turns them into
+    notifications in batches and deletes them.
+    """
+
+    recipient = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="+", db_index=False
+    )
+    verb = models.CharField(max_length=255)
+    actor_content_type = models.ForeignKey(
+        ContentType, on_delete=models.CASCADE, related_name="+"
+    )
+    actor_object_id = models.CharField(max_length=255)
+    action_object_content_type = models.ForeignKey(
+        ContentType, on_delete=models.CASCADE, null=True, related_name="+"
+    )
+    action_object_object_id = models.CharField(max_length=255, null=True)
+    target_content_type = models.ForeignKey(
+        ContentType, on_delete=models.CASCADE, null=True, related_name="+"
+    )
+    target_object_id = models.CharField(max_length=255, null=True)
+    created_at = models.DateTimeField()
+    claimed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["claimed_at", "id"], name="press_notif_event_queue_idx"
+            ),
+        ]
@@ -0,0 +1,88 @@
+from collections import Counter
+from typing import Dict, List
+
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Count
+
+from comments.models import MPTTComment
+from press.models import Follow, Post, PostLike
+from press.services.pagecache import invalidate_post_pages
+from press.services.rank import invalidate_trending_head, score_epoch, trending_score
+
+RECONCILE_BATCH_SIZE = 1000
+COUNTERS = ("like_count", "follow_count", "comment_count")
+
+
+def actual_counts(post_ids: List[int]) -> Dict[str, Dict[int, int]]:
+    """
+    The true value of every denormalized counter of ``post_ids``, one grouped
+    query each. Duplicated like/follow rows count once per user.
+    """
+    likes = (
+        PostLike.objects.filter(post__in=post_ids, active=True)
+        .values_list("post")
+        .annotate(n=Count("user", distinct=True))
+    )
+    follows = (
+        Follow.objects.filter(post__in=post_ids, active=True)
+        .values_list("post")
+        .annotate(n=Count("user", distinct=True))
+    )
+    comments = (
+        MPTTComment.objects.filter(
+            content_type=ContentType.objects.get_for_model(Post),
+            object_pk__in=[str(pk) for pk in post_ids],
+        )
+        .values_list("object_pk")
+        .annotate(n=Count("id"))
+    )
+    return {
+        "like_count": dict(likes),
+        "follow_count": dict(follows),
+        "comment_count": {int(pk): n for pk, n in comments},
+    }
+
+
+def reconcile_counters(batch_size=RECONCILE_BATCH_SIZE) -> Dict[str, Counter]:
+    """
+    Rewrite the counters of the posts that drifted, ``batch_size`` posts at a
+    time. Each fix is a conditional UPDATE on the counters read before the
+    true counts, so a post liked or followed meanwhile is left alone rather
+    than overwritten. Returns, per counter, how many posts were fixed and by
+    how much they were off.
+    """
+    now = score_epoch()
+    drift = {name: Counter() for name in COUNTERS}
+    posts = Post.objects.values_list(
+        "id", *COUNTERS, "modified_at", "created_at"
+    ).order_by("id")
+    last_id = 0
+    while True:
+        batch = list(posts.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            return drift
+        last_id = batch[-1][0]
+        actual = actual_counts([row[0] for row in batch])
+        for pk, *stored, modified_at, created_at in batch:
+            stored = dict(zip(COUNTERS, stored))
+            counts = {name: actual[name].get(pk, 0) for name in COUNTERS}
+            if counts == stored:
+                continue
+            post = Post(
+                id=pk,
+                score=trending_score(
+                    counts["like_count"], modified_at or created_at, now
+                ),
+                **counts,
+            )
+            if not Post.objects.filter(pk=pk, **stored).update(
+                score=post.score, **counts
+            ):
+                continue
+            for name in COUNTERS:
+                if counts[name] != stored[name]:
+                    drift[name]["posts"] += 1
+                    drift[name]["off_by"] += abs(counts[name] - stored[name])
+            invalidate_post_pages(pk)
+            if counts["like_count"] != stored["like_count"]:
+                invalidate_trending_head(post)
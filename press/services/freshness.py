@@ -0,0 +1,72 @@
+"""
+Validators for conditional GETs. Each page's ETag comes from one narrow
+query over the columns it displays, so unchanged pages can be answered with
+a 304 before any rendering. Only logged-out readers get one: logged-in
+pages carry per-session CSRF tokens and viewer state. The stored dates are
+day-granular, too coarse for Last-Modified, so they only feed the sitemap's
+``lastmod``.
+"""
+import hashlib
+from datetime import date
+from typing import Optional
+
+from press.models import Post, Profile
+from press.services.pagecache import comment_version
+
+POST_VALIDATOR_FIELDS = (
+    "modified_at",
+    "created_at",
+    "like_count",
+    "follow_count",
+    "comment_count",
+    "content_html_key",
+    "user__profile__updated_at",
+    "user__profile__name",
+    "user__profile__pic",
+)
+PROFILE_VALIDATOR_FIELDS = (
+    "updated_at",
+    "name",
+    "description",
+    "pic",
+    "user__post__id",
+    "user__post__follow_count",
+)
+
+
+def last_changed(*dates: Optional[date]) -> Optional[date]:
+    """The latest of ``dates``, ignoring missing ones."""
+    dates = [value for value in dates if value is not None]
+    return max(dates) if dates else None
+
+
+def _validator(request, model, fields, pk):
+    """The validator row of ``model`` ``pk``, fetched once per request."""
+    memo = request.__dict__.setdefault("_validators", {})
+    if (model, pk) not in memo:
+        memo[model, pk] = model.objects.filter(pk=pk).values(*fields).first()
+    return memo[model, pk]
+
+
+def _etag(request, row) -> Optional[str]:
+    if row is None:
+        return None
+    # Forms on the page embed a token derived from the CSRF cookie.
+    values = [request.META.get("CSRF_COOKIE", ""), *row.values()]
+    return hashlib.sha256(repr(values).encode()).hexdigest()[:32]
+
+
+def post_etag(request, pk=None, **kwargs) -> Optional[str]:
+    if pk is None or request.user.is_authenticated:
+        return None
+    row = _validator(request, Post, POST_VALIDATOR_FIELDS, pk)
+    if row is None:
+        return None
+    # Moderation changes the comment tree without touching comment_count.
+    return _etag(request, {**row, "comments": comment_version(pk)})
+
+
+def profile_etag(request, pk=None, **kwargs) -> Optional[str]:
+    if pk is None or request.user.is_authenticated:
+        return None
+    return _etag(request, _validator(request, Profile, PROFILE_VALIDATOR_FIELDS, pk))
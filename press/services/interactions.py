@@ -0,0 +1,73 @@
+from datetime import date
+from typing import Optional, Type, Union
+
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef
+
+from press.models import Follow, Post, PostLike
+from press.services.notifications import notify_many
+
+Interaction = Union[PostLike, Follow]
+
+# The post counter each interaction moves and the verb it notifies with.
+INTERACTIONS = {
+    PostLike: ("like_count", "liked your post"),
+    Follow: ("follow_count", "followed your post"),
+}
+
+
+def liked_by(user, post=OuterRef("pk")) -> Exists:
+    """``EXISTS`` subquery for an active like of ``post`` by ``user``."""
+    return Exists(PostLike.objects.filter(post=post, user=user, active=True))
+
+
+def followed_by(user, post=OuterRef("pk")) -> Exists:
+    """``EXISTS`` subquery for an active follow of ``post`` by ``user``."""
+    return Exists(Follow.objects.filter(post=post, user=user, active=True))
+
+
+def set_active(
+    model: Type[Interaction], post: Post, user, active: bool
+) -> Optional[Interaction]:
+    """
+    Idempotently make ``user``'s like or follow of ``post`` ``active``. The
+    row is only created the first time it's activated and flipped with a
+    conditional UPDATE afterwards, so concurrent toggles can't both count:
+    the counter and the notification only follow an actual flip, in the same
+    transaction.
+    """
+    counter, verb = INTERACTIONS[model]
+    with transaction.atomic():
+        interaction = model.objects.filter(post=post, user=user).first()
+        if interaction is None:
+            if not active:
+                return None
+            try:
+                with transaction.atomic():
+                    interaction = model.objects.create(
+                        post=post, user=user, active=True
+                    )
+                flipped = True
+            except IntegrityError:
+                # A concurrent request created it first.
+                interaction = model.objects.get(post=post, user=user)
+                flipped = _flip(interaction, active)
+        else:
+            flipped = _flip(interaction, active)
+        if flipped:
+            post.bump_counter(counter, 1 if active else -1)
+            if active:
+                notify_many(user, [post.user], verb, action_object=post)
+        return interaction
+
+
+def _flip(interaction: Interaction, active: bool) -> bool:
+    """Set ``active`` unless it already is; whether the row changed."""
+    interaction.active = active
+    interaction.updated_at = date.today()
+    return bool(
+        type(interaction)
+        .objects.filter(pk=interaction.pk)
+        .exclude(active=active)
+        .update(active=active, updated_at=interaction.updated_at)
+    )
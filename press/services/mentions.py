@@ -0,0 +1,87 @@
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.utils.html import format_html
+
+from press.utils import user_regex
+
+# Seconds a resolved username -> profile link is shared between renders; 0
+# resolves every render straight from the database.
+MENTION_CACHE_TTL = getattr(settings, "MENTION_CACHE_TTL", 60)
+
+
+def _cache_key(username: str) -> str:
+    return f"press:mention:{username}"
+
+
+def resolve_mentions(usernames: Iterable[str]) -> Dict[str, Optional[str]]:
+    """
+    Profile URL for each username (``None`` for unknown users), looked up
+    with a single query for whatever the cache doesn't already know.
+    """
+    usernames = set(usernames)
+    if not usernames:
+        return {}
+    links = {}
+    if MENTION_CACHE_TTL:
+        cached = cache.get_many([_cache_key(name) for name in usernames])
+        for name in usernames:
+            if _cache_key(name) in cached:
+                links[name] = cached[_cache_key(name)] or None
+
+    missing = usernames - links.keys()
+    if missing:
+        users = (
+            User.objects.filter(username__in=missing)
+            .select_related("profile")
+            .only("username", "profile__id")
+        )
+        found = {
+            user.username: user.profile.get_absolute_url()
+            for user in users
+            if getattr(user, "profile", None) is not None
+        }
+        for name in missing:
+            links[name] = found.get(name)
+        if MENTION_CACHE_TTL:
+            cache.set_many(
+                {_cache_key(name): links[name] or "" for name in missing},
+                MENTION_CACHE_TTL,
+            )
+    return links
+
+
+def mentioned_users(content: str) -> List[User]:
+    """The existing users ``@mentioned`` in ``content``, with profile and post."""
+    usernames = set(user_regex().findall(content))
+    if not usernames:
+        return []
+    return list(
+        User.objects.filter(username__in=usernames).select_related("profile", "post")
+    )
+
+
+def link_mentions(content: str, users: Optional[Iterable[User]] = None) -> str:
+    """
+    Turn every ``@username`` of an existing user into a link to their profile.
+    ``users`` skips the lookup when the mentioned users are already known.
+    """
+    if users is None:
+        links = resolve_mentions(user_regex().findall(content))
+    else:
+        links = {
+            user.username: user.profile.get_absolute_url()
+            for user in users
+            if getattr(user, "profile", None) is not None
+        }
+
+    def replace_user_with_anchor(user_matchobj):
+        username = user_matchobj.group(1)
+        link = links.get(username)
+        if link is None:
+            return "@" + username
+        return format_html("<a class='mention bold' href='{}'>@{}</a>", link, username)
+
+    return user_regex().sub(replace_user_with_anchor, content)
@@ -0,0 +1,366 @@
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Tuple
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+from notifications.models import Notification
+
+# Copied field by field between queued events and notifications.
+EVENT_FIELDS = (
+    "recipient_id",
+    "verb",
+    "actor_content_type_id",
+    "actor_object_id",
+    "action_object_content_type_id",
+    "action_object_object_id",
+    "target_content_type_id",
+    "target_object_id",
+)
+# Claimed events a worker didn't finish within this long are retried.
+CLAIM_TIMEOUT = timedelta(minutes=5)
+# Verbs merged into one unread notification per recipient and object.
+COALESCED_VERBS = ("liked your post", "followed your post")
+# Seconds an unread aggregate keeps absorbing new actors; 0 disables merging.
+COALESCE_WINDOW = getattr(settings, "NOTIFICATIONS_COALESCE_WINDOW", 24 * 60 * 60)
+# Actors kept on an aggregate to show next to the count.
+SAMPLE_ACTORS = 3
+# Seconds a user's cached unread count lives before it is counted again.
+UNREAD_CACHE_TTL = getattr(settings, "NOTIFICATIONS_UNREAD_TTL", 60 * 60)
+RECONCILE_BATCH_SIZE = 1000
+# Inbox cursor, newest first; matches the press_notif_inbox_idx index.
+INBOX_CURSOR = (("timestamp", datetime.fromisoformat), ("id", int))
+
+
+def build_notification(
+    actor, recipient, verb: str, action_object=None, target=None, timestamp=None
+) -> Notification:
+    """An unsaved notification, filled in the same way ``notify.send`` does."""
+    notification = Notification(
+        recipient=recipient,
+        actor_content_type=ContentType.objects.get_for_model(actor),
+        actor_object_id=actor.pk,
+        verb=str(verb),
+        timestamp=timestamp or timezone.now(),
+    )
+    for name, obj in (("action_object", action_object), ("target", target)):
+        if obj is not None:
+            setattr(
+                notification,
+                f"{name}_content_type",
+                ContentType.objects.get_for_model(obj),
+            )
+            setattr(notification, f"{name}_object_id", obj.pk)
+    return notification
+
+
+def _coalesce_key(notification: Notification) -> Tuple:
+    return (
+        notification.recipient_id,
+        notification.verb,
+        notification.action_object_content_type_id,
+        str(notification.action_object_object_id),
+    )
+
+
+def _merge_actor(aggregate: Notification, notification: Notification):
+    """
+    Fold ``notification``'s actor into ``aggregate``, which then reads as the
+    newest actor "and N others". An actor already in the sample (e.g. an
+    unlike and relike) only moves to the front; one that dropped out of the
+    sample is counted again.
+    """
+    data = aggregate.data or {}
+    actors = data.get("actors") or [aggregate.actor_object_id]
+    count = data.get("actor_count", len(actors))
+    actor = str(notification.actor_object_id)
+    if actor in actors:
+        actors.remove(actor)
+    else:
+        count += 1
+    aggregate.data = {
+        "actor_count": count,
+        "actors": [actor] + actors[: SAMPLE_ACTORS - 1],
+    }
+    aggregate.actor_content_type_id = notification.actor_content_type_id
+    aggregate.actor_object_id = actor
+    aggregate.timestamp = max(aggregate.timestamp, notification.timestamp)
+
+
+def coalesce_notifications(
+    notifications: List[Notification],
+) -> Tuple[List[Notification], List[Notification]]:
+    """
+    Split a batch into the notifications to insert and the unread aggregates
+    they were merged into. Likes and follows of the same object within
+    ``COALESCE_WINDOW`` become one row with an actor count, found with one
+    query for the whole batch.
+    """
+    if not COALESCE_WINDOW:
+        return notifications, []
+    mergeable = [n for n in notifications if n.verb in COALESCED_VERBS]
+    if not mergeable:
+        return notifications, []
+
+    cutoff = timezone.now() - timedelta(seconds=COALESCE_WINDOW)
+    aggregates = {}
+    existing = Notification.objects.filter(
+        recipient_id__in={n.recipient_id for n in mergeable},
+        verb__in={n.verb for n in mergeable},
+        unread=True,
+        timestamp__gte=cutoff,
+    ).order_by("timestamp")
+    for aggregate in existing:
+        aggregates[_coalesce_key(aggregate)] = aggregate
+
+    created, updated = [], {}
+    for notification in notifications:
+        if notification.verb not in COALESCED_VERBS:
+            created.append(notification)
+            continue
+        key = _coalesce_key(notification)
+        aggregate = aggregates.get(key)
+        if aggregate is None:
+            notification.actor_object_id = str(notification.actor_object_id)
+            notification.data = {
+                "actor_count": 1,
+                "actors": [notification.actor_object_id],
+            }
+            aggregates[key] = notification
+            created.append(notification)
+            continue
+        _merge_actor(aggregate, notification)
+        if aggregate.pk:
+            updated[aggregate.pk] = aggregate
+    return created, list(updated.values())
+
+
+def write_notifications(notifications: List[Notification]) -> List[Notification]:
+    """
+    Write a batch of notifications with a single INSERT, merging likes and
+    follows into the recipient's unread aggregates with a single UPDATE.
+    """
+    if not notifications:
+        return []
+    created, updated = coalesce_notifications(notifications)
+    delivered = timezone.now()
+    for aggregate in updated:
+        # Stamped when written rather than when enqueued, so the stream still
+        # sees merges the queue delivered late as new.
+        aggregate.timestamp = max(aggregate.timestamp, delivered)
+    if updated:
+        Notification.objects.bulk_update(
+            updated, ["actor_content_type", "actor_object_id", "timestamp", "data"]
+        )
+    created = Notification.objects.bulk_create(created)
+    for recipient_id, count in Counter(n.recipient_id for n in created).items():
+        _bump_unread(recipient_id, count)
+    return created + updated
+
+
+def _unread_key(user_id: int) -> str:
+    return f"press:unread:{user_id}"
+
+
+def _bump_unread(user_id: int, delta: int):
+    """Move a cached unread count; uncached counts are left to be recounted."""
+    try:
+        if cache.incr(_unread_key(user_id), delta) < 0:
+            cache.delete(_unread_key(user_id))
+    except ValueError:
+        pass
+
+
+def unread_count(user) -> int:
+    """``user``'s unread notifications, counted at most once per TTL."""
+    key = _unread_key(user.pk)
+    count = cache.get(key)
+    if count is None:
+        count = Notification.objects.filter(recipient=user, unread=True).count()
+        cache.add(key, count, UNREAD_CACHE_TTL)
+    return count
+
+
+def set_unread_counts(counts: Dict[int, int]):
+    """Cache freshly counted unread totals keyed by user id."""
+    cache.set_many(
+        {_unread_key(pk): count for pk, count in counts.items()}, UNREAD_CACHE_TTL
+    )
+
+
+def reconcile_unread_counts(batch_size=RECONCILE_BATCH_SIZE) -> Dict[str, int]:
+    """
+    Compare every cached unread count with the table and fix the ones that
+    drifted, e.g. through django-notifications' own mark-as-read views.
+    """
+    actual = dict(
+        Notification.objects.filter(unread=True)
+        .values_list("recipient")
+        .annotate(n=Count("id"))
+    )
+    drift = {"users": 0, "off_by": 0}
+    user_ids = list(User.objects.values_list("id", flat=True))
+    for start in range(0, len(user_ids), batch_size):
+        keys = {_unread_key(pk): pk for pk in user_ids[start : start + batch_size]}
+        fixed = {}
+        for key, cached in cache.get_many(keys).items():
+            expected = actual.get(keys[key], 0)
+            if cached != expected:
+                fixed[key] = expected
+                drift["users"] += 1
+                drift["off_by"] += abs(cached - expected)
+        cache.set_many(fixed, UNREAD_CACHE_TTL)
+    return drift
+
+
+def send_notifications(notifications: List[Notification]):
+    """
+    Deliver unsaved notifications: written right away when
+    ``NOTIFICATIONS_QUEUE_SYNC`` is set (development and tests), otherwise
+    queued for the process_notifications worker with one INSERT.
+    """
+    if getattr(settings, "NOTIFICATIONS_QUEUE_SYNC", True):
+        return write_notifications(notifications)
+    NotificationEvent = apps.get_model("press", "NotificationEvent")
+    events = [
+        NotificationEvent(
+            created_at=notification.timestamp,
+            **{name: getattr(notification, name) for name in EVENT_FIELDS},
+        )
+        for notification in notifications
+    ]
+    return NotificationEvent.objects.bulk_create(events)
+
+
+def claim_events(batch_size: int) -> List[Tuple[int, int]]:
+    """
+    Reserve up to ``batch_size`` queued events for this worker, returned as
+    ``(id, recipient_id)``. Rows other workers hold are skipped; stale claims
+    are taken over.
+    """
+    NotificationEvent = apps.get_model("press", "NotificationEvent")
+    now = timezone.now()
+    with transaction.atomic():
+        claimed = list(
+            NotificationEvent.objects.select_for_update(skip_locked=True)
+            .filter(Q(claimed_at__isnull=True) | Q(claimed_at__lt=now - CLAIM_TIMEOUT))
+            .order_by("id")
+            .values_list("id", "recipient_id")[:batch_size]
+        )
+        NotificationEvent.objects.filter(id__in=[pk for pk, _ in claimed]).update(
+            claimed_at=now
+        )
+    return claimed
+
+
+def deliver_events(ids: List[int]) -> int:
+    """Turn the claimed events ``ids`` into notifications and dequeue them."""
+    NotificationEvent = apps.get_model("press", "NotificationEvent")
+    try:
+        events = NotificationEvent.objects.filter(id__in=ids)
+        with transaction.atomic():
+            delivered = write_notifications(
+                [
+                    Notification(
+                        timestamp=event.created_at,
+                        **{name: getattr(event, name) for name in EVENT_FIELDS},
+                    )
+                    for event in events.order_by("id")
+                ]
+            )
+            NotificationEvent.objects.filter(id__in=ids).delete()
+        return len(delivered)
+    finally:
+        # Worker threads each hold their own connection.
+        if threading.current_thread() is not threading.main_thread():
+            connection.close()
+
+
+def drain_queue(batch_size: int, threads: int) -> int:
+    """
+    Claim one batch and deliver it across ``threads`` workers. Each recipient
+    is handled by a single worker so its aggregates are merged, not raced.
+    Databases without row locking (SQLite) only take one writer, so they
+    deliver inline.
+    """
+    claimed = claim_events(batch_size)
+    if not claimed:
+        return 0
+    if not connection.features.has_select_for_update_skip_locked:
+        threads = 1
+    if threads == 1:
+        return deliver_events([pk for pk, _ in claimed])
+    chunks = [[] for _ in range(threads)]
+    for pk, recipient_id in claimed:
+        chunks[recipient_id % threads].append(pk)
+    chunks = [chunk for chunk in chunks if chunk]
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return sum(pool.map(deliver_events, chunks))
+
+
+def queue_stats() -> Dict[str, float]:
+    """Queue depth and the age in seconds of the oldest waiting event."""
+    NotificationEvent = apps.get_model("press", "NotificationEvent")
+    stats = NotificationEvent.objects.aggregate(
+        depth=Count("id"), oldest=Min("created_at")
+    )
+    oldest = stats["oldest"]
+    return {
+        "depth": stats["depth"],
+        "lag": (timezone.now() - oldest).total_seconds() if oldest else 0.0,
+    }
+
+
+def notify_many(
+    actor,
+    recipients: Iterable,
+    verb: str,
+    action_object=None,
+    target=None,
+    timestamp=None,
+) -> List[Notification]:
+    """
+    Bulk equivalent of ``notify.send(actor, recipient=..., ...)`` for a
+    fan-out to many recipients.
+    """
+    timestamp = timestamp or timezone.now()
+    return send_notifications(
+        [
+            build_notification(actor, recipient, verb, action_object, target, timestamp)
+            for recipient in recipients
+        ]
+    )
+
+
+def get_inbox_queryset(user):
+    """
+    ``user``'s notifications with actors, their profiles and action objects
+    fetched in one query per content type instead of per row.
+    """
+    return Notification.objects.filter(recipient=user).prefetch_related(
+        "actor__profile", "action_object"
+    )
+
+
+def mark_read(notifications: Iterable[Notification]) -> int:
+    """Mark just ``notifications`` as read, skipping those already read."""
+    unread = {n.pk: n.recipient_id for n in notifications if n.unread}
+    if not unread:
+        return 0
+    marked = Notification.objects.filter(pk__in=unread, unread=True).update(
+        unread=False
+    )
+    recipients = set(unread.values())
+    if len(recipients) == 1:
+        _bump_unread(recipients.pop(), -marked)
+    else:
+        cache.delete_many([_unread_key(pk) for pk in recipients])
+    return marked
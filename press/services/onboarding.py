@@ -0,0 +1,35 @@
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from press.models import Post, Profile
+
+# Seconds a user is remembered as onboarded; the state is also dropped as
+# soon as their profile or post changes.
+ONBOARDING_CACHE_TTL = getattr(settings, "ONBOARDING_CACHE_TTL", 24 * 60 * 60)
+
+
+def _cache_key(user_id: int) -> str:
+    return f"press:onboarded:{user_id}"
+
+
+def onboarding_step(user) -> Optional[str]:
+    """
+    ``"profile"`` or ``"post"`` while ``user`` still has to fill them in,
+    ``None`` once onboarded. Only the final state is cached: it's what almost
+    every request sees, and users mid-onboarding need fresh answers.
+    """
+    if cache.get(_cache_key(user.pk)):
+        return None
+    profile = Profile.objects.filter(user=user).first()
+    if profile is None or not profile.is_valid:
+        return "profile"
+    if not Post.objects.filter(user=user).exists():
+        return "post"
+    cache.set(_cache_key(user.pk), True, ONBOARDING_CACHE_TTL)
+    return None
+
+
+def invalidate_onboarding(user_id: int):
+    cache.delete(_cache_key(user_id))
@@ -0,0 +1,115 @@
+"""
+Full-page cache for logged-out readers. Pages are keyed by their URL plus
+the version of every object they show; bumping an object's version (on
+edit, counter change or new comment) orphans all its cached pages at once,
+and the orphans simply expire. Comment trees are cached as fragments the
+same way, under their own version. Only needs get/set, so it works with any
+cache backend.
+"""
+import hashlib
+import time
+from functools import wraps
+from typing import Callable, Iterable
+
+from django.conf import settings
+from django.core.cache import cache
+
+# Seconds an anonymous post page is served from the cache. Edits, counter
+# changes and comments invalidate it earlier.
+PAGE_CACHE_TTL = getattr(settings, "PAGE_CACHE_TTL", 15 * 60)
+# Seconds a rendered comment tree is kept. New, edited and deleted comments
+# invalidate it sooner.
+COMMENT_CACHE_TTL = getattr(settings, "COMMENT_CACHE_TTL", 60 * 60)
+
+
+def _version_key(kind: str, pk) -> str:
+    return f"press:page-version:{kind}:{pk}"
+
+
+def page_version(kind: str, pk) -> int:
+    """
+    Current version of object ``kind``/``pk``. Versions are timestamps, so an
+    evicted version never comes back as one that cached pages still use.
+    """
+    key = _version_key(kind, pk)
+    version = cache.get(key)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_page_version(kind: str, pk):
+    cache.set(_version_key(kind, pk), time.time_ns(), None)
+
+
+def invalidate_post_pages(post_id):
+    """Drop every cached anonymous page showing post ``post_id``."""
+    bump_page_version("post", post_id)
+
+
+def comment_version(object_pk) -> int:
+    """Version of the comment tree under ``object_pk``; part of its fragment key."""
+    return page_version("comments", object_pk)
+
+
+def invalidate_comment_tree(object_pk):
+    """Drop the cached comment tree of ``object_pk``."""
+    bump_page_version("comments", object_pk)
+
+
+def page_key(request, versions: Iterable) -> str:
+    url = request.build_absolute_uri()
+    digest = hashlib.sha256("|".join([url, *map(str, versions)]).encode()).hexdigest()
+    return f"press:page:{digest}"
+
+
+def _cacheable(request, response) -> bool:
+    return (
+        response.status_code == 200
+        and not response.cookies
+        and not request.META.get("CSRF_COOKIE_NEEDS_UPDATE")
+    )
+
+
+def cache_anonymous_page(
+    timeout: int, versions: Callable[..., Iterable] = lambda request, **kwargs: ()
+):
+    """
+    Serve GETs by logged-out users from the cache for ``timeout`` seconds.
+    ``versions(request, **kwargs)`` lists the object versions the page
+    depends on. Logged-in users, pages that set cookies or embed a CSRF
+    token, and non-200 responses are never cached.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if (
+                request.method not in ("GET", "HEAD")
+                or request.user.is_authenticated
+                or request.session.get("onboarding")
+            ):
+                return view(request, *args, **kwargs)
+
+            key = page_key(request, versions(request, **kwargs))
+            response = cache.get(key)
+            if response is not None:
+                return response
+
+            response = view(request, *args, **kwargs)
+
+            def store(response):
+                if _cacheable(request, response):
+                    cache.set(key, response, timeout)
+
+            if hasattr(response, "add_post_render_callback"):
+                response.add_post_render_callback(store)
+            else:
+                store(response)
+            return response
+
+        return wrapped
+
+    return decorator
@@ -0,0 +1,154 @@
+from math import ceil
+from typing import Any, Callable, Optional, Sequence, Tuple
+
+from django.db.models import Q, QuerySet
+
+CURSOR_SEPARATOR = "~"
+
+CursorKeys = Sequence[Tuple[str, Callable[[str], Any]]]
+
+
+class CursorPage:
+    """
+    A page of a keyset paginated feed. Mirrors the parts of Django's ``Page``
+    the templates use, but navigates with cursors instead of page numbers.
+    ``num_pages`` is an estimate taken from a cached total.
+    """
+
+    def __init__(
+        self, object_list, number, num_pages, next_cursor, previous_cursor,
+    ):
+        self.object_list = object_list
+        self.number = number
+        self.num_pages = max(num_pages, number)
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def next_page_number(self):
+        return self.number + 1
+
+    def previous_page_number(self):
+        return max(self.number - 1, 1)
+
+
+class KeysetPaginator:
+    """
+    Paginates a queryset ordered descending by ``keys`` (the last key must be
+    unique) using ``WHERE (k1, k2) < (v1, v2)`` range conditions, so every
+    page is an index range scan and no ``COUNT(*)`` or ``OFFSET`` is needed.
+
+    ``head`` optionally holds the first rows of the queryset (e.g. from a
+    cache); pages that fall entirely inside it are sliced without a query.
+    """
+
+    def __init__(
+        self,
+        queryset: QuerySet,
+        keys: CursorKeys,
+        per_page: int,
+        total: int = 0,
+        head: Optional[Sequence] = None,
+        head_is_complete: bool = False,
+    ):
+        self.keys = keys
+        self.queryset = queryset.order_by(*[f"-{name}" for name, _ in keys])
+        self.per_page = per_page
+        self.total = total
+        self.head = head or []
+        self.head_is_complete = head_is_complete
+
+    def encode(self, obj) -> str:
+        return CURSOR_SEPARATOR.join(str(getattr(obj, name)) for name, _ in self.keys)
+
+    def decode(self, cursor: Optional[str]):
+        if not cursor:
+            return None
+        parts = cursor.split(CURSOR_SEPARATOR)
+        if len(parts) != len(self.keys):
+            return None
+        try:
+            return [parse(part) for (_, parse), part in zip(self.keys, parts)]
+        except (TypeError, ValueError):
+            return None
+
+    def _seek(self, values, lookup: str) -> Q:
+        condition = Q()
+        for i, (name, _) in enumerate(self.keys):
+            equal = {key: value for (key, _), value in zip(self.keys[:i], values)}
+            condition |= Q(**equal, **{f"{name}__{lookup}": values[i]})
+        return condition
+
+    def _from_head(self, after: Optional[str], before: Optional[str]):
+        """
+        Rows for the requested page, in descending order and with the extra
+        probe row, if they can be served from ``head``; ``None`` otherwise.
+        """
+        size = self.per_page + 1
+        cursors = [self.encode(row) for row in self.head]
+        if before:
+            if before not in cursors:
+                return None
+            stop = cursors.index(before)
+            return list(self.head[max(stop - size, 0) : stop])
+        if after:
+            if after not in cursors:
+                return None
+            start = cursors.index(after) + 1
+        else:
+            start = 0
+        rows = list(self.head[start : start + size])
+        if len(rows) < size and not self.head_is_complete:
+            return None
+        return rows
+
+    def _from_queryset(self, after, before):
+        size = self.per_page + 1
+        if before is not None:
+            rows = self.queryset.filter(self._seek(before, "gt")).reverse()[:size]
+            return list(rows)[::-1]
+        if after is not None:
+            return list(self.queryset.filter(self._seek(after, "lt"))[:size])
+        return list(self.queryset[:size])
+
+    def get_page(self, after=None, before=None, number=None) -> CursorPage:
+        try:
+            number = max(int(number), 1)
+        except (TypeError, ValueError):
+            number = 1
+        if self.decode(before) is None:
+            before = None
+        if self.decode(after) is None:
+            after = None
+
+        rows = self._from_head(after, before)
+        if rows is None:
+            rows = self._from_queryset(self.decode(after), self.decode(before))
+
+        if before is not None:
+            has_next, has_previous = True, len(rows) > self.per_page
+            rows = rows[-self.per_page :]
+        else:
+            has_next, has_previous = len(rows) > self.per_page, after is not None
+            rows = rows[: self.per_page]
+
+        if not has_previous:
+            number = 1
+        return CursorPage(
+            rows,
+            number=number,
+            num_pages=max(ceil(self.total / self.per_page), 1),
+            next_cursor=self.encode(rows[-1]) if has_next and rows else None,
+            previous_cursor=self.encode(rows[0]) if has_previous and rows else None,
+        )
@@ -1,59 +1,266 @@
+from datetime import date, datetime, time
+from typing import Dict, List, Optional
+
+from django.core.cache import cache
 from django.db.models import (
     F,
+    Value,
+    DateField,
     DateTimeField,
-    ExpressionWrapper,
     FloatField,
-    IntegerField,
     expressions,
 )
-from django.db.models.functions import Cast
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.conf import settings
 
 from press.models import Post, User
 
 G = 1.8
+RESCORE_BATCH_SIZE = 1000
+FEED_COUNT_TTL = 5 * 60
+
+# The cached head of the trending feed lives as long as the scores it was
+# ranked with, i.e. until the next rescore_posts run.
+TRENDING_CACHE_KEY = "press:trending:top"
+TRENDING_CACHE_SIZE = 3 * 15 + 1  # three home pages plus the has-next probe
+TRENDING_CACHE_TTL = getattr(settings, "TRENDING_CACHE_TTL", 60)
+
+# The ``now`` every stored score is decayed to. rescore_posts moves it;
+# scores written in between use it too, so they stay comparable.
+SCORE_EPOCH_KEY = "press:trending:epoch"
+
+TRENDING_CURSOR = (("score", float), ("id", int))
+FOLLOWED_CURSOR = (("last_update", date.fromisoformat), ("id", int))
 
 
-class Epoch(expressions.Func):
-    template = "EXTRACT(epoch FROM %(expressions)s)::INTEGER"
-    output_field = IntegerField()
+class SecondsSince(expressions.Func):
+    """Seconds from the start of the day in ``expression`` until ``now``."""
+
+    template = "EXTRACT(epoch FROM %(expressions)s)"
+    arg_joiner = " - "
+    output_field = FloatField()
+
+    def __init__(self, expression, now: datetime, **extra):
+        super().__init__(Value(now, DateTimeField()), expression, **extra)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler,
+            connection,
+            template="((julianday(%(expressions)s)) * 86400.0)",
+            arg_joiner=") - julianday(",
+            **extra_context,
+        )
+
+
+def trending_score(
+    like_count: int, modified_at: Optional[date], now: Optional[datetime] = None
+) -> float:
+    """
+    Rank = (L-1) / (T+1)^G, computed the same way as the production query:
+    T is the number of seconds since the start of the day of the last update.
+    """
+    now = now or timezone.now()
+    if modified_at is None:
+        return 0.0
+    updated = datetime.combine(modified_at, time.min, tzinfo=timezone.utc)
+    duration = max((now - updated).total_seconds(), 0.0)
+    return (like_count - 1.0) / (duration + 1.0) ** G
+
+
+def score_epoch() -> datetime:
+    """
+    The ``now`` stored scores are computed against: the last rescore's, so a
+    post scored between two rescores doesn't jump ahead of the others just
+    for having decayed less.
+    """
+    epoch = cache.get(SCORE_EPOCH_KEY)
+    if epoch is None:
+        epoch = timezone.now()
+        if not cache.add(SCORE_EPOCH_KEY, epoch, None):
+            epoch = cache.get(SCORE_EPOCH_KEY, epoch)
+    return epoch
+
+
+def set_score_epoch(now: datetime):
+    cache.set(SCORE_EPOCH_KEY, now, None)
+
+
+def rescore_posts(now: Optional[datetime] = None, batch_size=RESCORE_BATCH_SIZE):
+    """
+    Re-decay the stored score of every post against a single ``now`` so the
+    indexed ordering matches what the live formula would return.
+    Returns the number of rows that were rewritten.
+    """
+    now = now or timezone.now()
+    set_score_epoch(now)
+    changed = []
+    updated = 0
+    posts = Post.objects.only("id", "like_count", "modified_at", "created_at", "score")
+    for post in posts.iterator(chunk_size=batch_size):
+        score = trending_score(
+            post.like_count, post.modified_at or post.created_at, now
+        )
+        if score != post.score:
+            post.score = score
+            changed.append(post)
+        if len(changed) >= batch_size:
+            updated += Post.objects.bulk_update(changed, ["score"])
+            changed = []
+    if changed:
+        updated += Post.objects.bulk_update(changed, ["score"])
+    if updated:
+        cache.delete(TRENDING_CACHE_KEY)
+    return updated
+
+
+# Everything a feed card renders: the post, its author and their profile.
+POST_CARD_FIELDS = (
+    "id",
+    "title",
+    "like_count",
+    "comment_count",
+    "modified_at",
+    "created_at",
+    "score",
+    "user",
+    "user__username",
+    "user__profile__id",
+    "user__profile__name",
+    "user__profile__pic",
+)
+
+
+def with_post_cards(queryset, prefix: str = "", fields=()):
+    """
+    Join the posts (reached through ``prefix``) to their authors' profiles
+    and load only the columns the feed cards show, plus the queryset's own
+    ``fields``.
+    """
+    fields = [*fields, *(prefix + name for name in POST_CARD_FIELDS)]
+    if prefix:
+        fields.append(prefix.rstrip("_"))
+    return queryset.select_related(f"{prefix}user__profile").only(*fields)
 
 
 def get_trending_posts_queryset():
     """
-    Rank = (L-1) / (T+2)^G
+    Posts ordered by their stored trending score. Reads the
+    ``press_post_trending_idx`` index instead of ranking the whole table;
+    the scores are kept fresh by ``Post.save`` and the ``rescore_posts``
+    command.
+    """
+    return Post.objects.order_by("-score", "-id")
+
+
+def _count(name: str):
+    key = f"press:trending:{name}"
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        pass
+
+
+def get_trending_head() -> List[Post]:
+    """
+    The first ``TRENDING_CACHE_SIZE`` trending posts with their authors'
+    profiles, served from the cache while the scores are fresh.
+    """
+    entry = cache.get(TRENDING_CACHE_KEY)
+    if entry is not None:
+        _count("hits")
+        return entry["posts"]
+    _count("misses")
+    posts = list(with_post_cards(get_trending_posts_queryset())[:TRENDING_CACHE_SIZE])
+    entry = {
+        "posts": posts,
+        "ids": {post.pk for post in posts},
+        "floor": posts[-1].score if len(posts) == TRENDING_CACHE_SIZE else None,
+    }
+    cache.set(TRENDING_CACHE_KEY, entry, TRENDING_CACHE_TTL)
+    return posts
+
+
+def invalidate_trending_head(post: Post):
+    """
+    Drop the cached head only if ``post`` is in it or its new score would
+    move it in; changes further down the feed leave the entry alone.
+    """
+    entry = cache.get(TRENDING_CACHE_KEY)
+    if entry is None:
+        return
+    if (
+        post.pk in entry["ids"]
+        or entry["floor"] is None
+        or post.score >= entry["floor"]
+    ):
+        cache.delete(TRENDING_CACHE_KEY)
+
+
+def trending_cache_stats() -> Dict[str, int]:
+    """Hit and miss counters of the trending head cache."""
+    counters = cache.get_many(["press:trending:hits", "press:trending:misses"])
+    return {
+        "hits": counters.get("press:trending:hits", 0),
+        "misses": counters.get("press:trending:misses", 0),
+    }
+
+
+def trending_score_expression(likes=F("like_count"), now=None, gravity=G):
+    """
+    SQL counterpart of ``trending_score``, in seconds on every backend.
+    Defaults to the live ``now``; stored scores pass ``score_epoch()``.
+    """
+    now = now or timezone.now()
+    duration = SecondsSince(Coalesce("modified_at", "created_at"), now)
+    return Coalesce(
+        (likes - 1.0) / (duration + 1.0) ** gravity,
+        Value(0.0),
+        output_field=FloatField(),
+    )
+
+
+def get_live_trending_posts_queryset(now=None, gravity=G):
+    """
+    Ranks every post at query time. This is the reference ordering that the
+    stored ``Post.score`` mirrors; the home page should not use it.
+
+    Rank = (L-1) / (T+1)^G
     L = likes
-    T = time since last update
+    T = seconds since last update
     G = Gravity. Currently 1.8 but may change
     """
-    now = timezone.now()
-    if settings.DEBUG:
-        return (
-            Post.objects.annotate(
-                duration=ExpressionWrapper(
-                    Cast(now, DateTimeField()) - F("modified_at"),
-                    output_field=FloatField(),
-                )
-            )
-            .annotate(score=(F("like_count") - 1.0) / (F("duration") + 1.0) ** G)
-            .order_by("-score")
-        )
-    else:
-        return (
-            Post.objects.annotate(
-                duration=ExpressionWrapper(
-                    Cast(
-                        Epoch(Cast(now, DateTimeField()) - F("modified_at")),
-                        FloatField(),
-                    ),
-                    output_field=FloatField(),
-                )
-            )
-            .annotate(score=(F("like_count") - 1.0) / (F("duration") + 1.0) ** G)
-            .order_by("-score")
-        )
+    return Post.objects.annotate(
+        live_score=trending_score_expression(now=now, gravity=gravity)
+    ).order_by("-live_score", "-id")
 
 
 def get_followed_posts_queryset(user: User):
-    return user.follows.filter(active=True)
+    """``user``'s active follows with the followed posts ready for the feed cards."""
+    follows = with_post_cards(
+        user.follows.filter(active=True), prefix="post__", fields=["user"]
+    )
+    return follows.annotate(
+        last_update=Coalesce(
+            "post__modified_at",
+            "post__created_at",
+            Value(date.min),
+            output_field=DateField(),
+        )
+    )
+
+
+def get_trending_posts_count() -> int:
+    """Cached, possibly slightly stale, number of posts in the trending feed."""
+    return cache.get_or_set("press:trending-count", Post.objects.count, FEED_COUNT_TTL)
+
+
+def get_followed_posts_count(user: User) -> int:
+    """Cached, possibly slightly stale, number of posts ``user`` follows."""
+    return cache.get_or_set(
+        f"press:followed-count:{user.pk}",
+        lambda: user.follows.filter(active=True).count(),
+        FEED_COUNT_TTL,
+    )
@@ -0,0 +1,33 @@
+import hashlib
+
+import bleach
+from django.conf import settings
+from markdownx.utils import markdownify
+
+from press.services.mentions import link_mentions
+
+# Bump when the rendering pipeline changes in a way the settings below don't
+# capture (e.g. a markdown or bleach upgrade), then run render_posts.
+RENDERER_VERSION = 1
+
+
+def render_key(content: str) -> str:
+    """Hash of the content plus everything that affects how it renders."""
+    config = "|".join(
+        [
+            str(RENDERER_VERSION),
+            repr(getattr(settings, "MARKDOWNX_MARKDOWN_EXTENSIONS", [])),
+            repr(getattr(settings, "MARKDOWNX_MARKDOWN_EXTENSION_CONFIGS", {})),
+        ]
+    )
+    return hashlib.sha256(f"{config}|{content}".encode()).hexdigest()
+
+
+def render_content(content: str, users=None) -> str:
+    """
+    Sanitized, mention-linked HTML for a post's markdown. Mentions are
+    resolved at render time, so users who sign up later only get linked
+    after the post is edited or ``render_posts --force`` runs. ``users`` are
+    the already resolved mentioned users, see ``link_mentions``.
+    """
+    return link_mentions(markdownify(bleach.clean(content)), users)
@@ -0,0 +1,110 @@
+"""
+Vectorized trending ranking. Loads the ranking inputs of every post into
+NumPy arrays once, so several gravities (or formulas) can be scored and
+compared offline without touching the database again. NumPy isn't a
+dependency of the site; install it where ``tune_gravity`` runs.
+"""
+from dataclasses import dataclass
+from datetime import date, datetime, time
+from typing import Optional
+
+import numpy as np
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from press.models import Post
+from press.services.rank import G, RESCORE_BATCH_SIZE, TRENDING_CACHE_KEY
+
+EPOCH_DAY = date(1970, 1, 1)
+
+
+@dataclass
+class RankingInputs:
+    ids: np.ndarray
+    likes: np.ndarray
+    seconds: np.ndarray
+
+
+def load_inputs(now: Optional[datetime] = None, queryset=None) -> RankingInputs:
+    """
+    ``(id, like_count, seconds since last update)`` for every post, using
+    the same units as ``trending_score`` on every database.
+    """
+    now = now or timezone.now()
+    queryset = queryset if queryset is not None else Post.objects.all()
+    rows = list(queryset.values_list("id", "like_count", "modified_at", "created_at"))
+    ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    likes = np.fromiter((row[1] for row in rows), dtype=np.float64, count=len(rows))
+    # Days since the epoch, NaN for posts that were never dated.
+    days = np.fromiter(
+        (
+            ((row[2] or row[3]) - EPOCH_DAY).days if (row[2] or row[3]) else np.nan
+            for row in rows
+        ),
+        dtype=np.float64,
+        count=len(rows),
+    )
+    midnight = datetime.combine(EPOCH_DAY, time.min, tzinfo=timezone.utc)
+    elapsed = (now - midnight).total_seconds()
+    seconds = np.maximum(elapsed - days * 86400.0, 0.0)
+    return RankingInputs(ids=ids, likes=likes, seconds=seconds)
+
+
+def scores(inputs: RankingInputs, gravity: float = G) -> np.ndarray:
+    """Rank = (L-1) / (T+1)^G for every post at once."""
+    values = (inputs.likes - 1.0) / (inputs.seconds + 1.0) ** gravity
+    return np.nan_to_num(values, nan=0.0)
+
+
+def order(inputs: RankingInputs, values: np.ndarray) -> np.ndarray:
+    """Post ids sorted like the feed: score descending, then id descending."""
+    return inputs.ids[np.lexsort((-inputs.ids, -values))]
+
+
+def top(inputs: RankingInputs, values: np.ndarray, k: int) -> np.ndarray:
+    """The first ``k`` ids of ``order`` without sorting the whole table."""
+    if k >= len(values):
+        return order(inputs, values)
+    candidates = np.argpartition(-values, k)[:k]
+    picked = candidates[np.lexsort((-inputs.ids[candidates], -values[candidates]))]
+    return inputs.ids[picked]
+
+
+def positions(ids: np.ndarray, ordered: np.ndarray) -> np.ndarray:
+    """Rank (0 = first) of each of ``ids`` within ``ordered``."""
+    sorter = np.argsort(ordered)
+    return sorter[np.searchsorted(ordered, ids, sorter=sorter)]
+
+
+def rank_correlation(ids: np.ndarray, first: np.ndarray, second: np.ndarray) -> float:
+    """
+    Spearman's rho between two orderings of the same ``ids``; 1.0 means the
+    feed is identical, values near 0 mean the orderings are unrelated.
+    """
+    n = len(ids)
+    if n < 2:
+        return 1.0
+    a = positions(ids, first).astype(np.float64)
+    b = positions(ids, second).astype(np.float64)
+    return float(1.0 - 6.0 * np.sum((a - b) ** 2) / (n * (n ** 2 - 1)))
+
+
+def write_scores(
+    inputs: RankingInputs, values: np.ndarray, batch_size=RESCORE_BATCH_SIZE
+) -> int:
+    """Store ``values`` as ``Post.score`` in bulk; returns the rows written."""
+    written = 0
+    with transaction.atomic():
+        for start in range(0, len(values), batch_size):
+            posts = [
+                Post(id=int(pk), score=float(score))
+                for pk, score in zip(
+                    inputs.ids[start : start + batch_size],
+                    values[start : start + batch_size],
+                )
+            ]
+            written += Post.objects.bulk_update(posts, ["score"])
+    cache.delete(TRENDING_CACHE_KEY)
+    return written
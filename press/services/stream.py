@@ -0,0 +1,223 @@
+"""
+Server-sent notification stream. Every open tab holds one connection to
+``STREAM_PATH``; a single poller per process checks all connected users
+with one grouped query per tick and fans the changes out through an
+in-process hub, so idle tabs cost a held connection instead of requests.
+"""
+import asyncio
+import json
+from collections import Counter, defaultdict
+from importlib import import_module
+from http.cookies import SimpleCookie
+from types import SimpleNamespace
+from typing import Dict, Optional, Set
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.db import close_old_connections
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+from notifications.models import Notification
+
+from press.services.notifications import set_unread_counts, unread_count
+
+STREAM_PATH = "/inbox/notifications/stream/"
+# Seconds between two checks of the connected users' notifications.
+STREAM_INTERVAL = getattr(settings, "NOTIFICATIONS_STREAM_INTERVAL", 2)
+# Seconds between keep-alive comments, which also detect closed tabs.
+HEARTBEAT = 15
+# Events buffered per connection before a slow client starts missing some.
+QUEUE_SIZE = 32
+# Newest notifications summarized per user and tick.
+SUMMARY_LIMIT = 5
+
+
+def summarize(notification: Notification) -> Dict:
+    actor = notification.actor
+    profile = getattr(actor, "profile", None)
+    target = notification.action_object
+    data = notification.data or {}
+    return {
+        "id": notification.pk,
+        "actor": str(profile) if profile is not None else str(actor),
+        "others": max(data.get("actor_count", 1) - 1, 0),
+        "verb": notification.verb,
+        "url": target.get_absolute_url()
+        if hasattr(target, "get_absolute_url")
+        else None,
+        "timestamp": notification.timestamp.isoformat(),
+    }
+
+
+def _check(user_ids, since_id: int, since):
+    """
+    Unread counts of ``user_ids``, summaries of the ``SUMMARY_LIMIT`` newest
+    notifications each of them received since the last tick, inserted (id)
+    or merged into an aggregate (timestamp), and the newest id and timestamp
+    seen, which are the next tick's watermarks.
+    """
+    close_old_connections()
+    try:
+        counts = dict(
+            Notification.objects.filter(recipient_id__in=user_ids, unread=True)
+            .values_list("recipient")
+            .annotate(n=Count("id"))
+        )
+        counts = {pk: counts.get(pk, 0) for pk in user_ids}
+        set_unread_counts(counts)
+        rows = (
+            Notification.objects.filter(recipient_id__in=user_ids)
+            .filter(Q(id__gt=since_id) | Q(timestamp__gt=since))
+            .order_by("-timestamp", "-id")
+            .values_list("id", "recipient", "timestamp")
+        )
+        # Limited per recipient, so a burst for one user can't crowd the
+        # others out of the tick.
+        picked, per_user = [], Counter()
+        for pk, recipient_id, timestamp in rows.iterator():
+            since_id, since = max(since_id, pk), max(since, timestamp)
+            if per_user[recipient_id] < SUMMARY_LIMIT:
+                per_user[recipient_id] += 1
+                picked.append(pk)
+        fresh = (
+            Notification.objects.filter(pk__in=picked)
+            .prefetch_related("actor__profile", "action_object")
+            .order_by("-timestamp", "-id")
+        )
+        summaries = [(n.recipient_id, summarize(n)) for n in fresh]
+        return counts, summaries, since_id, since
+    finally:
+        close_old_connections()
+
+
+def _latest():
+    """Newest notification id and timestamp, where the stream starts from."""
+    close_old_connections()
+    try:
+        latest = Notification.objects.aggregate(
+            id=Max("id"), timestamp=Max("timestamp")
+        )
+        return latest["id"] or 0, latest["timestamp"] or timezone.now()
+    finally:
+        close_old_connections()
+
+
+class NotificationHub:
+    """Per-process fan-out from the poller to the connections of each user."""
+
+    def __init__(self):
+        self.subscribers: Dict[int, Set[asyncio.Queue]] = defaultdict(set)
+        self.poller: Optional[asyncio.Task] = None
+
+    def subscribe(self, user_id: int) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.subscribers[user_id].add(queue)
+        if self.poller is None or self.poller.done():
+            self.poller = asyncio.ensure_future(self.poll())
+        return queue
+
+    def unsubscribe(self, user_id: int, queue: asyncio.Queue):
+        self.subscribers[user_id].discard(queue)
+        if not self.subscribers[user_id]:
+            del self.subscribers[user_id]
+
+    def publish(self, user_id: int, event: str, data: Dict):
+        for queue in self.subscribers.get(user_id, ()):
+            try:
+                queue.put_nowait((event, data))
+            except asyncio.QueueFull:
+                pass
+
+    async def poll(self):
+        """Runs while anyone is connected; one query batch per tick for all."""
+        counts = {}
+        # Watermarks come from the rows seen, not this process's clock: the
+        # queue worker writes rows stamped earlier than when they land.
+        since_id, since = await sync_to_async(_latest)()
+        while self.subscribers:
+            await asyncio.sleep(STREAM_INTERVAL)
+            user_ids = list(self.subscribers)
+            current, fresh, since_id, since = await sync_to_async(_check)(
+                user_ids, since_id, since
+            )
+            for user_id, summary in reversed(fresh):
+                self.publish(user_id, "notification", summary)
+            for user_id, count in current.items():
+                if counts.get(user_id) != count:
+                    self.publish(user_id, "unread", {"count": count})
+            counts = current
+
+
+hub = NotificationHub()
+
+
+def _session_user(cookie_header: str):
+    cookies = SimpleCookie()
+    cookies.load(cookie_header)
+    morsel = cookies.get(settings.SESSION_COOKIE_NAME)
+    if morsel is None:
+        return None
+    store = import_module(settings.SESSION_ENGINE).SessionStore(morsel.value)
+    close_old_connections()
+    try:
+        user = get_user(SimpleNamespace(session=store))
+    finally:
+        close_old_connections()
+    return user if user.is_authenticated else None
+
+
+def _event(name: str, data: Dict) -> bytes:
+    return f"event: {name}\ndata: {json.dumps(data)}\n\n".encode()
+
+
+async def _disconnect(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def notification_stream(scope, receive, send):
+    """ASGI endpoint streaming ``unread`` and ``notification`` events."""
+    headers = dict(scope["headers"])
+    user = await sync_to_async(_session_user)(
+        headers.get(b"cookie", b"").decode("latin-1")
+    )
+    if user is None:
+        await send({"type": "http.response.start", "status": 403, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+        return
+
+    await send(
+        {
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"text/event-stream"),
+                (b"cache-control", b"no-cache"),
+                (b"x-accel-buffering", b"no"),
+            ],
+        }
+    )
+    queue = hub.subscribe(user.pk)
+    disconnected = asyncio.ensure_future(_disconnect(receive))
+    try:
+        count = await sync_to_async(unread_count)(user)
+        body = b"retry: 10000\n\n" + _event("unread", {"count": count})
+        while True:
+            await send({"type": "http.response.body", "body": body, "more_body": True})
+            event = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait(
+                {event, disconnected},
+                timeout=HEARTBEAT,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if event in done:
+                body = _event(*event.result())
+                continue
+            event.cancel()
+            if disconnected in done:
+                break
+            body = b": ping\n\n"
+    finally:
+        disconnected.cancel()
+        hub.unsubscribe(user.pk, queue)
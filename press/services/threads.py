@@ -0,0 +1,68 @@
+"""
+Paged comment threads. A post ships one page of its top-level comments,
+newest first like ``MPTTMeta.order_insertion_by``; the replies under a root
+are a single ``tree_id``/``lft``/``rght`` range, fetched only when a reader
+opens them.
+"""
+from datetime import datetime
+from typing import Optional
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import QuerySet
+from django.utils.encoding import force_str
+
+from comments.models import MPTTComment
+from press.services.pagination import CursorPage, KeysetPaginator
+
+ROOTS_PER_PAGE = getattr(settings, "COMMENT_ROOTS_PER_PAGE", 20)
+ROOT_CURSOR = (("submit_date", datetime.fromisoformat), ("id", int))
+
+
+def visible_comments() -> QuerySet:
+    """Comments ``get_comment_list`` would show, with what a node renders."""
+    return MPTTComment.objects.filter(
+        site_id=settings.SITE_ID, is_public=True, is_removed=False
+    ).select_related("user__profile")
+
+
+def _roots(obj) -> KeysetPaginator:
+    queryset = visible_comments().filter(
+        content_type=ContentType.objects.get_for_model(obj),
+        object_pk=force_str(obj.pk),
+        parent=None,
+    )
+    return KeysetPaginator(queryset, ROOT_CURSOR, ROOTS_PER_PAGE)
+
+
+def root_comments(obj, after=None) -> CursorPage:
+    """The page of ``obj``'s top-level comments following cursor ``after``."""
+    return _roots(obj).get_page(after=after)
+
+
+def root_cursor(obj, after) -> Optional[str]:
+    """
+    The cursor of the root comment of ``obj`` that ``after`` points at, as the
+    paginator encodes it, or ``None`` if there's no such root. Pages are
+    cached per cursor, so only real positions in a thread get an entry.
+    """
+    paginator = _roots(obj)
+    values = paginator.decode(after)
+    if values is None:
+        return None
+    root = (
+        paginator.queryset.select_related(None)
+        .only(*[name for name, _ in ROOT_CURSOR])
+        .filter(pk=values[-1])
+        .first()
+    )
+    return paginator.encode(root) if root is not None else None
+
+
+def replies(root: MPTTComment) -> QuerySet:
+    """Every reply under ``root``, in tree order for ``recursetree``."""
+    return (
+        visible_comments()
+        .filter(tree_id=root.tree_id, lft__gt=root.lft, rght__lt=root.rght)
+        .order_by("tree_id", "lft")
+    )
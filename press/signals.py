@@ -1,28 +1,33 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
-from notifications.signals import notify
+from press.models import Post, Profile
+from press.services.onboarding import invalidate_onboarding
+from press.services.pagecache import invalidate_post_pages
+from press.services.rank import invalidate_trending_head
 
-from press.models import PostLike, Follow
 
+@receiver(post_save, sender=Post)
+def trending_invalidation(sender, instance: Post, *args, **kwargs):
+    invalidate_trending_head(instance)
 
-@receiver(post_save, sender=PostLike)
-def like_notification(sender, instance: PostLike, *args, **kwargs):
-    if instance.active:
-        notify.send(
-            instance.user,
-            recipient=instance.post.user,
-            verb="liked your post",
-            action_object=instance.post,
-        )
 
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def post_page_invalidation(sender, instance: Post, *args, **kwargs):
+    invalidate_post_pages(instance.pk)
 
-@receiver(post_save, sender=Follow)
-def follow_notification(sender, instance: Follow, *args, **kwargs):
-    if instance.active:
-        notify.send(
-            instance.user,
-            recipient=instance.post.user,
-            verb="followed your post",
-            action_object=instance.post,
-        )
+
+@receiver(post_save, sender=Profile)
+def author_page_invalidation(sender, instance: Profile, *args, **kwargs):
+    for post_id in Post.objects.filter(user_id=instance.user_id).values_list(
+        "id", flat=True
+    ):
+        invalidate_post_pages(post_id)
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+@receiver(post_delete, sender=Post)
+def onboarding_invalidation(sender, instance, *args, **kwargs):
+    invalidate_onboarding(instance.user_id)
@@ -1,22 +1,75 @@
 from django import template
-from django.contrib.auth.models import User
-from django.utils.html import format_html
+from django.contrib.contenttypes.models import ContentType
 
-from press.utils import user_regex
+from press.services.mentions import link_mentions
+from press.services.notifications import unread_count
+from press.services.pagecache import COMMENT_CACHE_TTL, comment_version
+from press.services.stream import STREAM_PATH
+from press.services.threads import replies, root_comments
 
 register = template.Library()
 
 
-def replace_user_with_anchor(user_matchobj):
-    username = user_matchobj.group(1)
-    user = User.objects.filter(username=username).first()
-    if user is None:
-        return "@" + username
-    else:
-        link = user.profile.get_absolute_url()
-        return format_html("<a class='mention bold' href='{}'>@{}</a>", link, username)
-
-
 @register.filter(is_safe=True)
 def mentionify(content):
-    return user_regex().sub(replace_user_with_anchor, content)
+    return link_mentions(content)
+
+
+@register.simple_tag(takes_context=True)
+def query_replace(context, **kwargs):
+    """
+    Current query string with ``kwargs`` replaced; ``None`` values drop the
+    parameter. Lets one feed's pager keep the other feed's position.
+    """
+    query = context["request"].GET.copy()
+    for key, value in kwargs.items():
+        query.pop(key, None)
+        if value is not None:
+            query[key] = value
+    return "?" + query.urlencode()
+
+
+@register.filter
+def other_actors(notification):
+    """How many actors a coalesced notification holds besides its own."""
+    return max((notification.data or {}).get("actor_count", 1) - 1, 0)
+
+
+@register.simple_tag(takes_context=True)
+def unread_notifications(context):
+    """Cached unread count of the current user; replaces ``notifications_unread``."""
+    user = context["request"].user
+    if not user.is_authenticated:
+        return 0
+    return unread_count(user)
+
+
+@register.simple_tag
+def notification_stream_url():
+    return STREAM_PATH
+
+
+@register.simple_tag(name="comment_version")
+def comment_tree_version(object_pk):
+    """Version of the comment tree under ``object_pk``, to key ``{% cache %}``."""
+    return comment_version(object_pk)
+
+
+@register.simple_tag
+def comment_cache_ttl():
+    return COMMENT_CACHE_TTL
+
+
+@register.filter
+def content_type_id(obj):
+    return ContentType.objects.get_for_model(obj).pk
+
+
+@register.simple_tag(name="root_comments")
+def root_comments_page(obj, after=None):
+    return root_comments(obj, after or None)
+
+
+@register.simple_tag(name="replies")
+def comment_replies(root):
+    return replies(root)
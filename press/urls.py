@@ -15,6 +15,7 @@ from press.views import (
     ContactFormView,
     ContactSucessView,
     DeleteUserView,
+    ToggleInteractionView,
 )
 
 urlpatterns = [
@@ -24,6 +25,18 @@ urlpatterns = [
     path("profile/<int:pk>/", ProfileDetailView.as_view(), name="profile-detail"),
     path("post/create/", PostCreate.as_view(), name="post-create"),
     path("post/<int:pk>/", PostDetail.as_view(), name="post-detail"),
+    path(
+        "post/<int:pk>/like/",
+        ToggleInteractionView.as_view(),
+        {"kind": "like"},
+        name="post-like",
+    ),
+    path(
+        "post/<int:pk>/follow/",
+        ToggleInteractionView.as_view(),
+        {"kind": "follow"},
+        name="post-follow",
+    ),
     path("post/me/", UserPostDetail.as_view(), name="user-post-detail"),
     path("post/", PostUpdate.as_view(), name="post-update"),
     path("sent/", EmailSentView.as_view(), name="email-sent"),
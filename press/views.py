@@ -1,6 +1,6 @@
 from typing import Any, Dict
 from django.urls import reverse_lazy, reverse
-from django import views
+from django import forms, views
 from django.conf import settings
 from django.views.generic import TemplateView
 from django.views.generic.edit import FormView
@@ -9,15 +9,35 @@ from django.views.generic.edit import CreateView
 from django.views.generic.edit import DeleteView
 from django.views.generic.detail import DetailView
 from django.utils import timezone
-from django.core.paginator import Paginator
-from django.shortcuts import render, redirect
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+from django.utils.http import url_has_allowed_host_and_scheme
+from django.shortcuts import get_object_or_404, render, redirect
 from django.contrib.auth import login
 from django.contrib.auth.models import User
 from django.contrib.auth.mixins import LoginRequiredMixin, AccessMixin
-from django.http import HttpResponseRedirect
+from django.db.models import OuterRef
+from django.http import HttpResponseRedirect, JsonResponse
 from press.forms import ContactForm, FollowForm, PostLikeform, ProfileForm, RegisterForm
 from press.models import Follow, PostLike, Profile, Post
-from press.services.rank import get_followed_posts_queryset, get_trending_posts_queryset
+from press.services.freshness import post_etag, profile_etag
+from press.services.interactions import followed_by, liked_by, set_active
+from press.services.notifications import INBOX_CURSOR, get_inbox_queryset, mark_read
+from press.services.onboarding import onboarding_step
+from press.services.pagecache import PAGE_CACHE_TTL, cache_anonymous_page, page_version
+from press.services.pagination import KeysetPaginator
+from press.services.rank import (
+    FOLLOWED_CURSOR,
+    TRENDING_CACHE_SIZE,
+    TRENDING_CACHE_TTL,
+    TRENDING_CURSOR,
+    get_followed_posts_count,
+    get_followed_posts_queryset,
+    get_trending_head,
+    get_trending_posts_count,
+    get_trending_posts_queryset,
+    with_post_cards,
+)
 from press.verification import send_verification, verify_user_token
 
 PAGING = 15
@@ -33,13 +53,11 @@ class EmailSentView(TemplateView):
 
 class ProfileRequiredMixin(AccessMixin):
     def dispatch(self, request, *args, **kwargs):
-        if request.user.is_authenticated and not request.user.profile.is_valid:
+        step = request.user.is_authenticated and onboarding_step(request.user)
+        if step == "profile":
             request.session["onboarding"] = "profile"
             return redirect("profile-update")
-        if (
-            request.user.is_authenticated
-            and not Post.objects.filter(user=request.user).exists()
-        ):
+        if step == "post":
             request.session["onboarding"] = "post"
             return redirect("post-create")
         return super().dispatch(request, *args, **kwargs)
@@ -104,33 +122,48 @@ class UpdateProfileView(LoginRequiredMixin, UpdateView):
         return resp
 
 
+def interaction_form(form_class, post, user, active):
+    """Unbound toggle form reflecting ``active`` without touching the database."""
+    return form_class(
+        initial={"user": user, "post": post, "active": not active},
+        instance=form_class._meta.model(post=post, user=user, active=active),
+    )
+
+
+def requested_state(request, current: bool) -> bool:
+    """The state a toggle form asks for, or the opposite of ``current``."""
+    if "active" not in request.POST:
+        return not current
+    return forms.BooleanField(required=False).to_python(request.POST["active"])
+
+
+@method_decorator(condition(etag_func=profile_etag), name="get")
 class ProfileDetailView(ProfileRequiredMixin, DetailView):
     model = Profile
     fields = ["user", "name", "pic", "description"]
 
+    def get_queryset(self):
+        queryset = Profile.objects.select_related("user__post")
+        if self.request.user.is_authenticated:
+            queryset = queryset.annotate(
+                followed=followed_by(self.request.user, OuterRef("user__post"))
+            )
+        return queryset
+
     def get_object(self):
         pk = self.kwargs.get(self.pk_url_kwarg)
         slug = self.kwargs.get(self.slug_url_kwarg)
         if pk is None and slug is None:
-            return Profile.objects.get(user=self.request.user)
+            return self.get_queryset().get(user=self.request.user)
         else:
             return super().get_object()
 
     def get_context_data(self, **kwargs) -> Dict[str, Any]:
         context = super().get_context_data(**kwargs)
-        if self.request.user.is_authenticated:
-            follow, _ = Follow.objects.get_or_create(
-                user=self.request.user,
-                post=self.get_object().user.post,
-                defaults={"active": False},
-            )
-            follow_form = FollowForm(
-                initial={
-                    "user": follow.user,
-                    "post": follow.post,
-                    "active": not follow.active,
-                },
-                instance=follow,
+        post = getattr(self.object.user, "post", None)
+        if self.request.user.is_authenticated and post is not None:
+            follow_form = interaction_form(
+                FollowForm, post, self.request.user, self.object.followed
             )
         else:
             follow_form = FollowForm()
@@ -140,23 +173,16 @@ class ProfileDetailView(ProfileRequiredMixin, DetailView):
     def post(self, request, *args, **kwargs):
         if not self.request.user.is_authenticated:
             return redirect("login")
-        follow, _ = Follow.objects.get_or_create(
-            user=self.request.user,
-            post=self.get_object().user.post,
-            defaults={"active": False},
-        )
-        form = FollowForm(
-            data=request.POST,
-            initial={
-                "user": self.request.user,
-                "post": self.get_object().user.post,
-                "active": not follow.active,
-            },
-            instance=follow,
-        )
-        form.is_valid()
-        form.save()
-        return HttpResponseRedirect(self.get_object().get_absolute_url())
+        self.object = self.get_object()
+        post = getattr(self.object.user, "post", None)
+        if post is not None:
+            set_active(
+                Follow,
+                post,
+                request.user,
+                requested_state(request, self.object.followed),
+            )
+        return HttpResponseRedirect(self.object.get_absolute_url())
 
 
 class PostCreate(LoginRequiredMixin, CreateView):
@@ -171,15 +197,22 @@ class PostCreate(LoginRequiredMixin, CreateView):
 
     def form_valid(self, form):
         form.instance.user = self.request.user
+        form.instance.modified_at = timezone.localdate()
         self.object = form.save()
         self.object.notify_mentions()
-        self.object.modified_at = timezone.now()
-        self.object.save()
         if self.request.session.get("onboarding") == "post":
             self.request.session.pop("onboarding")
         return HttpResponseRedirect(self.get_success_url())
 
 
+# Outermost, so unchanged pages get a 304 before the page cache is read.
+@method_decorator(condition(etag_func=post_etag), name="get")
+@method_decorator(
+    cache_anonymous_page(
+        PAGE_CACHE_TTL, lambda request, pk=None, **kwargs: [page_version("post", pk)],
+    ),
+    name="get",
+)
 class PostDetail(ProfileRequiredMixin, DetailView):
     model = Post
     fields = ["user", "title", "content"]
@@ -190,11 +223,20 @@ class PostDetail(ProfileRequiredMixin, DetailView):
         except Post.DoesNotExist:
             return redirect("post-create")
 
+    def get_queryset(self):
+        queryset = Post.objects.all()
+        if self.request.user.is_authenticated:
+            queryset = queryset.annotate(
+                liked=liked_by(self.request.user),
+                followed=followed_by(self.request.user),
+            )
+        return queryset
+
     def get_object(self):
         pk = self.kwargs.get(self.pk_url_kwarg)
         slug = self.kwargs.get(self.slug_url_kwarg)
         if pk is None and slug is None:
-            return Post.objects.get(user=self.request.user)
+            return self.get_queryset().get(user=self.request.user)
         else:
             return super().get_object()
 
@@ -202,41 +244,12 @@ class PostDetail(ProfileRequiredMixin, DetailView):
         context = super().get_context_data(**kwargs)
         context["markdown"] = self.object.markdown
         if self.request.user.is_authenticated:
-            try:
-                like, _ = PostLike.objects.get_or_create(
-                    post=self.object, user=self.request.user, defaults={"active": False}
-                )
-            except PostLike.MultipleObjectsReturned:
-                like = PostLike.objects.filter(
-                    post=self.object, user=self.request.user
-                ).first()
-                PostLike.objects.filter(user=like.user, post=like.post).exclude(
-                    pk=like.id
-                ).delete()
-            try:
-                follow, _ = Follow.objects.get_or_create(
-                    user=like.user, post=like.post, defaults={"active": False},
-                )
-            except Follow.MultipleObjectsReturned:
-                follow = Follow.objects.filter(user=like.user, post=like.post).first()
-                Follow.objects.filter(user=like.user, post=like.post).exclude(
-                    pk=follow.id
-                ).delete()
-            like_form = PostLikeform(
-                initial={
-                    "user": like.user,
-                    "post": like.post,
-                    "active": not like.active,
-                },
-                instance=like,
+            user = self.request.user
+            like_form = interaction_form(
+                PostLikeform, self.object, user, self.object.liked
             )
-            follow_form = FollowForm(
-                initial={
-                    "user": like.user,
-                    "post": like.post,
-                    "active": not follow.active,
-                },
-                instance=follow,
+            follow_form = interaction_form(
+                FollowForm, self.object, user, self.object.followed
             )
         else:
             like_form = PostLikeform()
@@ -249,64 +262,66 @@ class PostDetail(ProfileRequiredMixin, DetailView):
     def post(self, request, *args, **kwargs):
         if not self.request.user.is_authenticated:
             return redirect("login")
+        try:
+            self.object = self.get_object()
+        except Post.DoesNotExist:
+            return redirect("post-create")
         if "like" in request.POST:
-            try:
-                like, _ = PostLike.objects.get_or_create(
-                    post=self.get_object(),
-                    user=self.request.user,
-                    defaults={"active": False},
-                )
-            except PostLike.MultipleObjectsReturned:
-                like = PostLike.objects.filter(
-                    post=self.object, user=self.request.user
-                ).first()
-                PostLike.objects.filter(user=like.user, post=like.post).exclude(
-                    pk=like.id
-                ).delete()
-            form = PostLikeform(
-                data=request.POST,
-                initial={
-                    "post": like.post,
-                    "user": like.user,
-                    "active": not like.active,
-                },
-                instance=like,
+            set_active(
+                PostLike,
+                self.object,
+                request.user,
+                requested_state(request, self.object.liked),
             )
-            form.is_valid()
-            form.save()
-            return HttpResponseRedirect(like.post.get_absolute_url())
         elif "follow" in request.POST:
-            try:
-                follow, _ = Follow.objects.get_or_create(
-                    user=self.request.user,
-                    post=self.get_object(),
-                    defaults={"active": False},
-                )
-            except Follow.MultipleObjectsReturned:
-                follow = Follow.objects.filter(
-                    user=self.request.user, post=self.get_object()
-                ).first()
-                Follow.objects.filter(user=follow.user, post=follow.post).exclude(
-                    pk=follow.id
-                ).delete()
-            form = FollowForm(
-                data=request.POST,
-                initial={
-                    "user": self.request.user,
-                    "post": self.get_object(),
-                    "active": not follow.active,
-                },
-                instance=follow,
+            set_active(
+                Follow,
+                self.object,
+                request.user,
+                requested_state(request, self.object.followed),
             )
-            form.is_valid()
-            form.save()
-            return HttpResponseRedirect(self.get_object().get_absolute_url())
+        return HttpResponseRedirect(self.object.get_absolute_url())
 
 
 class UserPostDetail(LoginRequiredMixin, PostDetail):
     pass
 
 
+class ToggleInteractionView(LoginRequiredMixin, views.View):
+    """
+    Sets the viewer's like or follow of a post. Scripts asking for JSON get
+    the new state and count back; plain form posts are redirected to ``next``.
+    """
+
+    interactions = {
+        "like": (PostLike, "like_count"),
+        "follow": (Follow, "follow_count"),
+    }
+
+    def post(self, request, pk, kind):
+        model, counter = self.interactions[kind]
+        post = get_object_or_404(Post.objects.select_related("user"), pk=pk)
+        if "active" in request.POST:
+            active = requested_state(request, False)
+        else:
+            active = not model.objects.filter(
+                post=post, user=request.user, active=True
+            ).exists()
+        set_active(model, post, request.user, active)
+
+        if "application/json" in request.headers.get("Accept", ""):
+            count = Post.objects.values_list(counter, flat=True).get(pk=pk)
+            return JsonResponse({"active": active, "count": count})
+        next_url = request.POST.get("next")
+        if not url_has_allowed_host_and_scheme(
+            next_url,
+            allowed_hosts={request.get_host()},
+            require_https=request.is_secure(),
+        ):
+            next_url = post.get_absolute_url()
+        return HttpResponseRedirect(next_url)
+
+
 class PostUpdate(ProfileRequiredMixin, LoginRequiredMixin, UpdateView):
     model = Post
     fields = ["content"]
@@ -321,30 +336,45 @@ class PostUpdate(ProfileRequiredMixin, LoginRequiredMixin, UpdateView):
     def get_object(self):
         return Post.objects.get(user=self.request.user)
 
-    def post(self, *args, **kwargs):
-        response = super().post(*args, **kwargs)
-        post = self.get_object()
-        post.notify_mentions()
-        post.make_comments_old()
-        post.modified_at = timezone.now()
-        post.save()
+    def form_valid(self, form):
+        form.instance.modified_at = timezone.localdate()
+        response = super().form_valid(form)
+        self.object.notify_mentions()
+        self.object.make_comments_old()
         return response
 
 
+@method_decorator(cache_anonymous_page(TRENDING_CACHE_TTL), name="get")
 class Home(ProfileRequiredMixin, views.View):
     def get(self, request, *args, **kwargs):
-        trending = get_trending_posts_queryset()
-        trending_paginator = Paginator(trending, PAGING)
-        trend_page_number = request.GET.get("trend_page")
-        trend_page = trending_paginator.get_page(trend_page_number)
+        trending_head = get_trending_head()
+        trending_paginator = KeysetPaginator(
+            with_post_cards(get_trending_posts_queryset()),
+            TRENDING_CURSOR,
+            PAGING,
+            total=get_trending_posts_count(),
+            head=trending_head,
+            head_is_complete=len(trending_head) < TRENDING_CACHE_SIZE,
+        )
+        trend_page = trending_paginator.get_page(
+            after=request.GET.get("trend_after"),
+            before=request.GET.get("trend_before"),
+            number=request.GET.get("trend_page"),
+        )
 
-        if not request.user.is_authenticated:
-            follow = Follow.objects.none()
-        else:
-            follow = get_followed_posts_queryset(self.request.user)
-        follow_paginator = Paginator(follow, PAGING)
-        follow_page_number = request.GET.get("follow_page")
-        follow_page = follow_paginator.get_page(follow_page_number)
+        follow_page = None
+        if request.user.is_authenticated:
+            follow_paginator = KeysetPaginator(
+                get_followed_posts_queryset(self.request.user),
+                FOLLOWED_CURSOR,
+                PAGING,
+                total=get_followed_posts_count(self.request.user),
+            )
+            follow_page = follow_paginator.get_page(
+                after=request.GET.get("follow_after"),
+                before=request.GET.get("follow_before"),
+                number=request.GET.get("follow_page"),
+            )
 
         return render(
             request,
@@ -352,21 +382,26 @@ class Home(ProfileRequiredMixin, views.View):
             {
                 "trend_page_obj": trend_page,
                 "follow_page_obj": follow_page,
-                "has_follows": follow.exists(),
+                "has_follows": follow_page is not None
+                and (bool(follow_page.object_list) or follow_page.has_previous()),
             },
         )
 
 
 class News(ProfileRequiredMixin, LoginRequiredMixin, views.View):
     def get(self, request, *args, **kwargs):
-        notifications = request.user.notifications.all()
-        pages = Paginator(notifications, PAGING)
-        page = request.GET.get("page")
-        notifications_page = pages.get_page(page)
+        paginator = KeysetPaginator(
+            get_inbox_queryset(request.user), INBOX_CURSOR, PAGING
+        )
+        notifications_page = paginator.get_page(
+            after=request.GET.get("after"),
+            before=request.GET.get("before"),
+            number=request.GET.get("page"),
+        )
         response = render(
             request, "press/news.html", {"notifications_page": notifications_page},
         )
-        notifications.mark_all_as_read()
+        mark_read(notifications_page)
         return response
 
 
@@ -13,4 +13,14 @@ os.environ.setdefault("DJANGO_CONFIGURATION", "DEV")
 
 from configurations.asgi import get_asgi_application
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Django 4.1 can't stream from async views, so the notification stream is
+# routed ahead of Django as a plain ASGI app.
+from press.services.stream import STREAM_PATH, notification_stream
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "http" and scope["path"] == STREAM_PATH:
+        return await notification_stream(scope, receive, send)
+    return await django_application(scope, receive, send)
@@ -155,6 +155,38 @@ class DEV(Configuration):
     LOGIN_REDIRECT_URL = "/"
 
     MARKDOWNX_MARKDOWN_EXTENSIONS = ["extra", "toc", "fenced_code"]
+
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "pressnt",
+        }
+    }
+    # Seconds an anonymous post page is served from the page cache; edits,
+    # counter changes and new comments invalidate it sooner.
+    PAGE_CACHE_TTL = 15 * 60
+    # Seconds a post's rendered comment tree is reused; comment changes
+    # invalidate it sooner.
+    COMMENT_CACHE_TTL = 60 * 60
+    # Top-level comments per page; replies are loaded on demand.
+    COMMENT_ROOTS_PER_PAGE = 20
+    # Seconds the cached head of the trending feed is served for. Keep it in
+    # line with how often rescore_posts re-decays the scores.
+    TRENDING_CACHE_TTL = 60
+    # Seconds a resolved @mention link is reused across renders.
+    MENTION_CACHE_TTL = 60
+    # Write notifications inside the request instead of queueing them for
+    # the process_notifications worker.
+    NOTIFICATIONS_QUEUE_SYNC = True
+    # Seconds during which likes and follows of a post are merged into one
+    # unread notification.
+    NOTIFICATIONS_COALESCE_WINDOW = 24 * 60 * 60
+    # Seconds a user's unread notification count is cached between recounts.
+    NOTIFICATIONS_UNREAD_TTL = 60 * 60
+    # Seconds between the stream's checks for new notifications.
+    NOTIFICATIONS_STREAM_INTERVAL = 2
+    # Seconds a user is remembered as having a complete profile and a post.
+    ONBOARDING_CACHE_TTL = 24 * 60 * 60
     EMAIL_VERIFIED_CALLBACK = verified_callback
     EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
 
@@ -163,6 +195,11 @@ class PROD(DEV):
     INSTALLED_APPS = apps_to_install
     DEBUG = False
     DATABASES = values.DatabaseURLValue(environ_required=True)
+    # Must be shared by every process: daphne workers, the notifications
+    # worker and management commands all invalidate each other's entries.
+    # docker-compose defaults to a file:// cache on a shared volume; its
+    # incr() isn't atomic, reconcile_unread repairs the counts it loses.
+    CACHES = values.CacheURLValue(environ_required=True)
 
     ALLOWED_HOSTS = ["app.pressnt.net"]
     CSRF_TRUSTED_ORIGINS = ["https://app.pressnt.net"]
@@ -181,6 +218,8 @@ class PROD(DEV):
     STATIC_URL = AWS_S3_ENDPOINT_URL + "/pressnt/"
     MEDIA_URL = AWS_S3_ENDPOINT_URL + "/media/"
 
+    NOTIFICATIONS_QUEUE_SYNC = False
+
     EMAIL_VERIFIED_CALLBACK = verified_callback
     EMAIL_BACKEND = "sendgrid_backend.SendgridBackend"
     SENDGRID_API_KEY = os.getenv("SENDGRID_API_KEY")
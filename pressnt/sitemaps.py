@@ -1,6 +1,8 @@
 from django.contrib.sitemaps import Sitemap
+from django.db.models import F
 from django.urls import reverse
 from press.models import Post
+from press.services.freshness import last_changed
 
 
 class PostSitemap(Sitemap):
@@ -8,10 +10,15 @@ class PostSitemap(Sitemap):
     priority = 0.5
 
     def items(self):
-        return Post.objects.all()
+        return (
+            Post.objects.annotate(profile_updated_at=F("user__profile__updated_at"))
+            .only("id", "modified_at", "created_at")
+            .order_by("id")
+        )
 
     def lastmod(self, obj):
-        return obj.modified_at
+        # Same dates the post page's Last-Modified header is built from.
+        return last_changed(obj.modified_at or obj.created_at, obj.profile_updated_at)
 
     def get_domain(self, *args):
         return "app.pressnt.net"
@@ -27,6 +27,7 @@ urlpatterns = [
     path("markdownx/", include("markdownx.urls")),
     path("accounts/", include("django.contrib.auth.urls")),
     path("__reload__/", include("django_browser_reload.urls")),
+    path("comments/", include("comments.urls")),
     path("comments/", include("django_comments.urls")),
     path("", include("press.urls")),
     path(
@@ -0,0 +1,30 @@
+// Keeps the News badge in sync through the server-sent notification stream.
+(function () {
+    if (!window.EventSource) {
+        return;
+    }
+    var source = new EventSource(document.currentScript.dataset.url);
+
+    source.addEventListener("unread", function (event) {
+        var count = JSON.parse(event.data).count;
+        var badges = document.getElementsByClassName("live_notify_badge");
+        for (var i = 0; i < badges.length; i++) {
+            badges[i].textContent = count;
+        }
+    });
+
+    source.addEventListener("notification", function (event) {
+        var notification = JSON.parse(event.data);
+        document.dispatchEvent(new CustomEvent("notification", {detail: notification}));
+        var lists = document.getElementsByClassName("live_notify_list");
+        for (var i = 0; i < lists.length; i++) {
+            var item = document.createElement("li");
+            var text = notification.actor;
+            if (notification.others) {
+                text += " and " + notification.others + " other" + (notification.others > 1 ? "s" : "");
+            }
+            item.textContent = text + " " + notification.verb;
+            lists[i].prepend(item);
+        }
+    });
+})();
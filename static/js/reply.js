@@ -0,0 +1,40 @@
+// Moves the page's single comment form under the comment being replied to,
+// and back to its place when it's closed. Without the form (logged out),
+// the Reply links lead to the login page.
+(function () {
+    var form = document.querySelector("form[data-reply-form]");
+    if (!form) {
+        return;
+    }
+    var home = document.createComment("reply-form");
+    form.parentNode.insertBefore(home, form);
+    var parent = form.querySelector("[data-reply-parent]");
+    var toggle = form.querySelector("button:not([data-reply-close])");
+    var fields = toggle.nextElementSibling;
+
+    function open(link) {
+        parent.value = link.dataset.reply;
+        link.parentNode.insertBefore(form, link.nextSibling);
+        toggle.classList.add("hidden");
+        fields.classList.remove("hidden");
+        var textarea = form.querySelector("textarea");
+        if (textarea) {
+            textarea.focus();
+        }
+    }
+
+    function close() {
+        parent.value = "";
+        home.parentNode.insertBefore(form, home.nextSibling);
+    }
+
+    document.addEventListener("click", function (event) {
+        var link = event.target.closest("[data-reply]");
+        if (link) {
+            event.preventDefault();
+            open(link);
+        } else if (event.target.closest("[data-reply-close]")) {
+            close();
+        }
+    });
+})();
@@ -0,0 +1,47 @@
+// Replaces "load replies" and "load more comments" links with the thread
+// fragment they point to. A link to a comment that isn't on the page yet
+// (e.g. from a notification) opens every reply stub to find it.
+(function () {
+    function load(link) {
+        if (link.dataset.busy) {
+            return Promise.resolve();
+        }
+        link.dataset.busy = "1";
+        return fetch(link.href, {credentials: "same-origin"})
+            .then(function (response) {
+                if (!response.ok) {
+                    throw new Error(response.status);
+                }
+                return response.text();
+            })
+            .then(function (html) {
+                var fragment = document.createRange().createContextualFragment(html);
+                link.replaceWith(fragment);
+                if (window.pressTimesince) {
+                    window.pressTimesince();
+                }
+            })
+            .catch(function () {
+                delete link.dataset.busy;
+            });
+    }
+
+    document.addEventListener("click", function (event) {
+        var link = event.target.closest("a[data-thread-load]");
+        if (link) {
+            event.preventDefault();
+            load(link);
+        }
+    });
+
+    var target = window.location.hash.slice(1);
+    if (/^c\d+$/.test(target) && !document.getElementById(target)) {
+        var stubs = document.querySelectorAll("a[data-thread-load][href*='/replies/']");
+        Promise.all(Array.prototype.map.call(stubs, load)).then(function () {
+            var node = document.getElementById(target);
+            if (node) {
+                node.scrollIntoView();
+            }
+        });
+    }
+})();
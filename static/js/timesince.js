@@ -0,0 +1,50 @@
+// Rewrites server-rendered "timesince" dates against the reader's clock, so
+// cached comment trees don't show the age they had when they were rendered.
+(function () {
+    var UNITS = [
+        ["year", 365 * 24 * 60 * 60],
+        ["month", 30 * 24 * 60 * 60],
+        ["week", 7 * 24 * 60 * 60],
+        ["day", 24 * 60 * 60],
+        ["hour", 60 * 60],
+        ["minute", 60],
+    ];
+
+    function plural(count, name) {
+        return count + " " + name + (count === 1 ? "" : "s");
+    }
+
+    // Same shape as Django's timesince filter: up to two adjacent units.
+    function timesince(date, now) {
+        var seconds = Math.floor((now - date) / 1000);
+        for (var i = 0; i < UNITS.length; i++) {
+            var count = Math.floor(seconds / UNITS[i][1]);
+            if (count > 0) {
+                var text = plural(count, UNITS[i][0]);
+                var next = UNITS[i + 1];
+                if (next) {
+                    var rest = Math.floor((seconds - count * UNITS[i][1]) / next[1]);
+                    if (rest > 0) {
+                        text += ", " + plural(rest, next[0]);
+                    }
+                }
+                return text;
+            }
+        }
+        return plural(0, "minute");
+    }
+
+    function refresh(root) {
+        var now = Date.now();
+        (root || document).querySelectorAll("time[data-timesince]").forEach(function (el) {
+            var date = Date.parse(el.getAttribute("datetime"));
+            if (!isNaN(date)) {
+                el.textContent = timesince(date, now);
+            }
+        });
+    }
+
+    window.pressTimesince = refresh;
+    refresh();
+    setInterval(refresh, 60 * 1000);
+})();
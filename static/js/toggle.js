@@ -0,0 +1,48 @@
+// Submits like/follow forms in the background and updates them in place.
+// Falls back to a normal submit when the endpoint doesn't answer with JSON.
+(function () {
+    function update(form, state) {
+        var button = form.querySelector("[data-labels]");
+        var labels = button.dataset.labels.split(",");
+        button.value = state.active ? labels[1] : labels[0];
+        var active = form.querySelector("input[name=active]");
+        if (active) {
+            active.value = state.active ? "False" : "True";
+        }
+        var count = form.querySelector("[data-count]");
+        if (count) {
+            count.textContent = state.count;
+        }
+    }
+
+    document.addEventListener("submit", function (event) {
+        var form = event.target;
+        if (!form.hasAttribute("data-toggle") || !form.action || form.dataset.busy) {
+            return;
+        }
+        event.preventDefault();
+        form.dataset.busy = "1";
+        fetch(form.action, {
+            method: "POST",
+            body: new FormData(form),
+            headers: {"Accept": "application/json"},
+            credentials: "same-origin",
+        })
+            .then(function (response) {
+                var type = response.headers.get("content-type") || "";
+                if (!response.ok || type.indexOf("application/json") === -1) {
+                    throw new Error("not json");
+                }
+                return response.json();
+            })
+            .then(function (state) {
+                update(form, state);
+            })
+            .catch(function () {
+                form.submit();
+            })
+            .finally(function () {
+                delete form.dataset.busy;
+            });
+    });
+})();